@@ -30,6 +30,11 @@ const STRATEGY_OPTIONS = [
     label: "Hybrid Search",
     description: "Semantic + keyword matching",
   },
+  {
+    value: "hybrid-server",
+    label: "Server Hybrid",
+    description: "Hybrid fused in the database",
+  },
   {
     value: "multi-query-vector",
     label: "Multi-Query Vector",
@@ -42,9 +47,9 @@ const STRATEGY_OPTIONS = [
   },
 ];
 
-const RERANKING_MODELS = [
-  { value: "rerank-english-v3.0", label: "rerank-english-v3.0" },
-];
+// Cross-encoder models need the optional sentence-transformers package on the server,
+// which is not part of the default install, so only the built-in reranker is offered.
+const RERANKING_MODELS = [{ value: "lexical-bm25", label: "BM25 (lexical)" }];
 
 const EMBEDDING_MODELS = [
   { value: "text-embedding-3-large", label: "text-embedding-3-large" },
@@ -63,6 +68,19 @@ const AGENT_MODE_OPTIONS = [
   },
 ];
 
+const RAG_TOOL_MODE_OPTIONS = [
+  {
+    value: "answer",
+    label: "Written Answer",
+    description: "Search tool answers with its own LLM call",
+  },
+  {
+    value: "context",
+    label: "Retrieved Context",
+    description: "Agent answers from cited chunks directly",
+  },
+];
+
 // Utility functions
 const documentUtils = {
   formatFileSize: (bytes: number) => {
@@ -292,6 +310,7 @@ export function KnowledgeBaseSidebar({
     const strategyConfig = {
       basic: { latency: 400 },
       hybrid: { latency: 600 },
+      "hybrid-server": { latency: 450 },
       "multi-query-vector": { latency: 800 },
       "multi-query-hybrid": { latency: 1000 },
     }[projectSettings.rag_strategy] || { latency: 400 };
@@ -308,8 +327,10 @@ export function KnowledgeBaseSidebar({
       ? projectSettings.number_of_queries * 200
       : 0;
     const rerankingLatency = projectSettings.reranking_enabled ? 200 : 0;
+    // "answer" mode adds a full generation inside the search tool
+    const answerLatency = projectSettings.rag_tool_mode === "context" ? 0 : 2000;
 
-    const latency = baseLatency + queryLatency + rerankingLatency;
+    const latency = baseLatency + queryLatency + rerankingLatency + answerLatency;
 
     return { totalChunks, latency };
   };
@@ -835,6 +856,49 @@ export function KnowledgeBaseSidebar({
 
                 <hr className="border-gray-800" />
 
+                {/* Search Tool Output */}
+                <section className="space-y-4">
+                  <h3 className="text-sm font-medium text-gray-200">
+                    Search Tool Output
+                  </h3>
+                  <div className="space-y-2">
+                    {RAG_TOOL_MODE_OPTIONS.map((mode) => (
+                      <label
+                        key={mode.value}
+                        className={`block p-3 rounded-lg border cursor-pointer transition-colors ${
+                          projectSettings.rag_tool_mode === mode.value
+                            ? "border-gray-600 bg-[#252525]"
+                            : "border-gray-800 bg-[#202020] hover:border-gray-700"
+                        }`}
+                      >
+                        <div className="flex items-center gap-3">
+                          <input
+                            type="radio"
+                            name="ragToolMode"
+                            value={mode.value}
+                            checked={projectSettings.rag_tool_mode === mode.value}
+                            onChange={(e) =>
+                              onUpdateSettings({ rag_tool_mode: e.target.value })
+                            }
+                            disabled={settingsLoading}
+                            className="w-4 h-4 text-gray-400 bg-transparent border-gray-500 focus:ring-0"
+                          />
+                          <div className="flex-1">
+                            <div className="text-sm font-medium text-gray-200">
+                              {mode.label}
+                            </div>
+                            <div className="text-xs text-gray-400 mt-0.5">
+                              {mode.description}
+                            </div>
+                          </div>
+                        </div>
+                      </label>
+                    ))}
+                  </div>
+                </section>
+
+                <hr className="border-gray-800" />
+
                 {/* Performance Impact */}
                 <section className="space-y-4">
                   <h3 className="text-sm font-medium text-gray-200">
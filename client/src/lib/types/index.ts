@@ -45,6 +45,7 @@ export interface ProjectSettings {
   reranking_model: string;
   vector_weight: number;
   keyword_weight: number;
+  rag_tool_mode: string;
   created_at: string;
 }
 
@@ -0,0 +1,67 @@
+"""
+Micro-benchmark: dict-based vs NumPy RRF fusion.
+
+Simulates multi-query hybrid retrieval (number_of_queries x 2 legs of chunks_per_search
+results drawn from an overlapping pool), checks both paths return the same ranking and
+prints the median time per fusion.
+
+    poetry run python scripts/benchmark_rrf_fusion.py
+"""
+
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from src.rag.retrieval.fusion import rrf_rank_and_fuse_numpy, rrf_rank_and_fuse_python
+
+FINAL_CONTEXT_SIZE = 5
+REPEATS = 50
+
+
+def make_result_lists(number_of_lists, chunks_per_search, pool_size, seed):
+    rng = random.Random(seed)
+    pool = [{"id": f"chunk-{index}", "document_id": "doc"} for index in range(pool_size)]
+    return [rng.sample(pool, chunks_per_search) for _ in range(number_of_lists)]
+
+
+def median_milliseconds(function, *args, **kwargs):
+    timings = []
+    for _ in range(REPEATS):
+        started_at = time.perf_counter()
+        function(*args, **kwargs)
+        timings.append(time.perf_counter() - started_at)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    print(f"{'lists':>5} {'per list':>8} {'pool':>6} | {'python ms':>9} {'numpy ms':>9} {'numpy top-k ms':>14}")
+    for number_of_queries, chunks_per_search in [(1, 20), (3, 50), (5, 100), (5, 500), (10, 1000)]:
+        number_of_lists = number_of_queries * 2  # vector + keyword leg per query
+        pool_size = chunks_per_search * 3
+        result_lists = make_result_lists(number_of_lists, chunks_per_search, pool_size, seed=7)
+        weights = [0.7, 0.3] * number_of_queries
+
+        expected = [chunk["id"] for chunk in rrf_rank_and_fuse_python(result_lists, weights)]
+        assert [chunk["id"] for chunk in rrf_rank_and_fuse_numpy(result_lists, weights)] == expected
+        assert [
+            chunk["id"]
+            for chunk in rrf_rank_and_fuse_numpy(result_lists, weights, top_k=FINAL_CONTEXT_SIZE)
+        ] == expected[:FINAL_CONTEXT_SIZE]
+
+        python_ms = median_milliseconds(rrf_rank_and_fuse_python, result_lists, weights)
+        numpy_ms = median_milliseconds(rrf_rank_and_fuse_numpy, result_lists, weights)
+        top_k_ms = median_milliseconds(
+            rrf_rank_and_fuse_numpy, result_lists, weights, top_k=FINAL_CONTEXT_SIZE
+        )
+        print(
+            f"{number_of_lists:>5} {chunks_per_search:>8} {pool_size:>6} | "
+            f"{python_ms:>9.3f} {numpy_ms:>9.3f} {top_k_ms:>14.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
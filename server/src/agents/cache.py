@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from src.config.index import appConfig
+from src.services.memoryCache import TTLCache
+from src.rag.retrieval.cache import (
+    cache_key,
+    get_cached_project_state,
+    settings_fingerprint,
+)
+from src.agents.simple_agent.agent import create_simple_custom_agent
+from src.agents.supervisor_agent.agent import create_supervisor_agent
+
+# agent_graph_key(...) -> compiled agent graph (simple agent or supervisor)
+agent_graph_cache = TTLCache(
+    max_entries=appConfig["agent_graph_cache_max_entries"],
+    ttl_seconds=appConfig["agent_graph_cache_ttl_seconds"],
+)
+
+
+def agent_graph_key(project_id, agent_type, project_settings):
+    """
+    Key for a project's compiled agent: the project, agent type and settings. Settings come
+    from the version-checked project cache, so a settings update builds a new graph.
+    The supervisor and web agent prompts carry the current date, so graphs are rebuilt daily.
+    """
+    return cache_key(
+        project_id,
+        agent_type,
+        settings_fingerprint(project_settings),
+        datetime.now().strftime("%Y-%m-%d"),
+    )
+
+
+def get_chat_agent(project_id):
+    """
+    Return (agent, agent_type) for the project's agent_type setting, compiling the graph
+    (tools, tool binding, sub-agents) only on the first message after a settings change.
+    Graphs hold no per-chat state; chat history is passed as input messages on each call.
+    """
+    project_settings, _, _ = get_cached_project_state(project_id)
+    agent_type = project_settings.get("agent_type") or "simple"
+
+    key = agent_graph_key(project_id, agent_type, project_settings)
+    agent = agent_graph_cache.get(key)
+    if agent is None:
+        if agent_type == "agentic":
+            agent = create_supervisor_agent(project_id=project_id)
+        else:
+            agent = create_simple_custom_agent(project_id=project_id)
+        agent_graph_cache.set(key, agent)
+        print(f"Compiled {agent_type} agent for project {project_id}")
+
+    return agent, agent_type
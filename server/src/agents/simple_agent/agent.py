@@ -1,4 +1,5 @@
-from typing import Any, List, Dict, Optional, Literal, TypedDict
+import asyncio
+from typing import Any, List, Dict, Literal, TypedDict
 from typing_extensions import Annotated
 from langchain.tools import tool
 from langchain_core.tools.base import InjectedToolCallId
@@ -6,11 +7,11 @@ from langchain_core.messages import ToolMessage, AIMessage, SystemMessage
 from langgraph.graph import MessagesState, StateGraph, START, END, add_messages
 from langgraph.types import Command
 
-from src.rag.retrieval.index import retrieve_context
-from src.rag.retrieval.utils import prepare_prompt_and_invoke_llm
+from src.rag.retrieval.index import answer_with_rag
 # from src.models.index import InputGuardrailCheck
 
 from src.services.llm import openAI
+from src.config.index import appConfig
 
 # =============================================================================
 # STATE DEFINITION
@@ -31,7 +32,7 @@ BASE_SYSTEM_PROMPT = """You are a helpful AI assistant with access to a RAG (Ret
 For every user question:
 
 1. Do not assume any question is purely conceptual or general.  
-2. Use the `rag_search` tool immediately with a clear and relevant query derived from the user's question. 
+2. Use the `rag_search` tool immediately with a clear and relevant query derived from the user's question. If the question has several distinct parts, call `rag_search` once per part in the same turn; the calls run in parallel. 
 3. Use the chat history to understand the context and references in the current question. 
 4. Carefully review the retrieved documents and base your entire answer on the RAG results.  
 5. If the retrieved information fully answers the user's question, respond clearly and completely using that information.  
@@ -42,48 +43,12 @@ For every user question:
 **Never answer without first querying the RAG tool. This ensures every response is grounded in project-specific context and documentation.**
 """
 
-def format_chat_history(chat_history:List[Dict[str,str]])->str:
+def get_system_prompt() -> str:
     """
-    Format chat history into a readable string for the system prompt
-
-    Args:
-        chat_history: List of message dictionaries with 'role' and 'content' keys
-    Returns:
-        Formatted string representation of the chat history
-
-    """
-    if not chat_history:
-        return ""
-
-    formatted_messages = []
-    for msg in chat_history:
-        role = msg.get("role","unknown")
-        content = msg.get("content", "")
-        role_lable = "User Message" if role.lower()=="user" else "AI Messaage"
-        formatted_messages.append(f"{role_lable}: {content}")
-
-    return "\n\n".join(formatted_messages)
-
-def get_system_prompt(chat_history: Optional[List[Dict[str,str]]]=None) -> str:
-    """
-    Get the system prompt for the RAG agent, optionally including chat history.
-
-    Args:
-        chat_history: Optional list of previous messages with role and content keys
-    
-    Returns:
-        The system prompt string, with chat history appended if provided.
+    Get the system prompt for the RAG agent.
+    Chat history is not part of the prompt; it is passed as input messages on each invocation.
     """
-    prompt = BASE_SYSTEM_PROMPT
-    if chat_history:
-        formatted_history = format_chat_history(chat_history)
-        if formatted_history:
-            prompt += "\n\n### Previous Conversation Context\n"
-            prompt += "The following is the recent conversation history for context: \n\n"
-            prompt += formatted_history
-            prompt += "\n\nUse this conversation history to understand context and references in the current question."
-
-    return prompt 
+    return BASE_SYSTEM_PROMPT
 
 # def should_continue(state: CustomAgentState) -> Literal["agent", "__end__"]:
 #     """
@@ -158,7 +123,7 @@ def create_rag_tool(project_id: str):
     """
     
     @tool
-    def rag_search(
+    async def rag_search(
         query: str,
         tool_call_id: Annotated[str, InjectedToolCallId],
     ) -> Command:
@@ -174,35 +139,34 @@ def create_rag_tool(project_id: str):
             A Command object with updated messages and citations
         """
         try:
-            # Retrieve context using the existing RAG pipeline
-            texts, images, tables, citations = retrieve_context(project_id, query)
+            # Retrieve context and answer using the existing RAG pipeline
+            # (served from the semantic answer cache for repeated questions)
+            # (blocking database and LLM calls, so run in a worker thread to keep the event loop free)
+            response, citations, metrics = await asyncio.to_thread(
+                answer_with_rag, project_id, query
+            )
             # If no context found, return a message
-            if not texts:
+            if response is None:
                 return Command(
                     update={
                         "messages": [
                             ToolMessage(
                                 "No relevant information found in the project documents for this query.",
+                                artifact={"rag_metrics": metrics},
                                 tool_call_id=tool_call_id
                             )
                         ]
                     }
                 )
                 
-            # Prepare the response using the existing LLM preparation function
-            response = prepare_prompt_and_invoke_llm(
-                user_query=query,
-                texts=texts,
-                images=images,
-                tables=tables
-            )
-            
             return Command(
                 update={
                     # Update message history
                     "messages": [
                         ToolMessage(
                             content=response,
+                            # Latency and token counts of this search, kept out of the model's context
+                            artifact={"rag_metrics": metrics},
                             tool_call_id=tool_call_id
                         )
                     ],
@@ -254,7 +218,6 @@ def create_rag_tool(project_id: str):
 def create_simple_custom_agent(
     project_id: str,
     # model_name: str = "gpt-4o",
-    chat_history: Optional[List[Dict[str,str]]] = None
 ):
     """
     Create an agent with RAG tool for a specific project.
@@ -263,22 +226,22 @@ def create_simple_custom_agent(
     - a RAG tool
     - custom state schema
     - A system prompt
-    - Optional chat_history context in system prompt
+
+    The agent holds no per-chat state, so one compiled graph can serve every chat of the project.
+    Chat history is passed per invocation, as the messages before the new user message.
 
     Args:
-        model: the chat model to use.
-        chat_history: Optional list of previous messages with "role" and "content" keys.
+        project_id: The UUID of the project whose documents should be searchable
 
     Returns:
         A configured LangGraph agent that can answer questions using the product documents via RAG   
     """
-    print("chat_history: ", chat_history)
     llm = openAI["chat_llm"]
 
     rag_tool = create_rag_tool(project_id=project_id)
     tools = [rag_tool]
 
-    system_prompt = get_system_prompt(chat_history=chat_history)
+    system_prompt = get_system_prompt()
     llm_with_tools = llm.bind_tools(tools=tools)
 
     graph = StateGraph(CustomAgentState)
@@ -306,29 +269,45 @@ def create_simple_custom_agent(
         else: 
             return END
 
+    async def run_tool_call(tool_call, semaphore: asyncio.Semaphore):
+        print("-"*20, "tool_call","-"*20)
+        print(tool_call)
+        tool_name = tool_call["name"]
+        tool_args = tool_call["args"]
+        tool_id = tool_call.get("id") or tool_call.get("tool_call_id")
+
+        if tool_name != rag_tool.name:
+            return [], []
+
+        clean_args = {k: v for k, v in tool_args.items() if k != "tool_call_id"}
+        async with semaphore:
+            command = await rag_tool.ainvoke({
+                "args":clean_args,
+                "name":tool_name,
+                "type":"tool_call",
+                "id":tool_id}) # rag_search returns a command
+        update = command.update if hasattr(command, "update") else command
+        return update.get("messages",[]), update.get("citations",[])
+
     async def tool_node(state: CustomAgentState):
+        """
+        Run every tool call of the last model turn concurrently, at most
+        `agent_max_parallel_tool_calls` at a time. Tool messages and citations keep the
+        order of the tool calls.
+        """
         print("inside tool_node")
         tool_calls = state["messages"][-1].tool_calls
+        semaphore = asyncio.Semaphore(appConfig["agent_max_parallel_tool_calls"])
+
+        results = await asyncio.gather(
+            *(run_tool_call(tool_call, semaphore) for tool_call in tool_calls)
+        )
+
         tool_messages = []
-        citations = [] 
-
-        for tool_call in tool_calls:
-            print("-"*20, "tool_call","-"*20)
-            print(tool_call)
-            tool_name = tool_call["name"]
-            tool_args = tool_call["args"]
-            tool_id = tool_call.get("id") or tool_call.get("tool_call_id")
-
-            if tool_name == rag_tool.name:
-                clean_args = {k: v for k, v in tool_args.items() if k != "tool_call_id"}
-                command = await rag_tool.ainvoke({
-                    "args":clean_args,
-                    "name":tool_name,
-                    "type":"tool_call", 
-                    "id":tool_id}) # rag_search returns a command 
-                update = command.update if hasattr(command, "update") else command
-                tool_messages.extend(update.get("messages",[]))
-                citations.extend(update.get("citations",[]))
+        citations = []
+        for messages, tool_citations in results:
+            tool_messages.extend(messages)
+            citations.extend(tool_citations)
 
         print("-"*20, "tool_call ends", "-"*20)
         return {"messages": tool_messages, "citations": citations}
@@ -1,4 +1,5 @@
-from typing import Any, List, Dict, Optional
+import asyncio
+from typing import Any, List, Dict
 from typing_extensions import Annotated
 from datetime import datetime
 import os
@@ -13,8 +14,8 @@ from langgraph.graph import MessagesState
 from langgraph.types import Command
 from langgraph.prebuilt import create_react_agent
 
-from src.rag.retrieval.index import retrieve_context
-from src.rag.retrieval.utils import prepare_prompt_and_invoke_llm
+from src.rag.retrieval.index import answer_with_rag, RAG_TOOL_MODE_CONTEXT
+from src.rag.retrieval.cache import get_cached_project_state
 from src.services.llm import openAI
 from src.services.awsS3 import s3_client
 from src.services.supabase import supabase
@@ -53,57 +54,13 @@ class CustomAgentState(MessagesState):
 # PROMPTS
 # =============================================================================
 
-def format_chat_history(chat_history: List[Dict[str, str]]) -> str:
+def get_supervisor_system_prompt() -> str:
     """
-    Format chat history into a readable string for the system prompt.
+    Get the system prompt for the supervisor agent.
+    Chat history is not part of the prompt; it is passed as input messages on each invocation.
     
-    Args:
-        chat_history: List of message dictionaries with 'role' and 'content' keys
-        
     Returns:
-        Formatted string representation of the chat history
-        
-    Example:
-        >>> history = [
-        ...     {"role": "user", "content": "What is attention?"},
-        ...     {"role": "assistant", "content": "Attention is a mechanism..."}
-        ... ]
-        >>> formatted = format_chat_history(history)
-        >>> print(formatted)
-        User Message: What is attention?
-        AI Message: Attention is a mechanism...
-    """
-    if not chat_history:
-        return ""
-    
-    formatted_messages = []
-    for msg in chat_history:
-        role = msg.get("role", "unknown")
-        content = msg.get("content", "")
-        # Format: "User Message: message" or "AI Message: message"
-        role_label = "User Message" if role.lower() == "user" else "AI Message"
-        formatted_messages.append(f"{role_label}: {content}")
-    
-    return "\n\n".join(formatted_messages)
-
-def get_supervisor_system_prompt(chat_history: Optional[List[Dict[str, str]]] = None) -> str:
-    """
-    Get the system prompt for the supervisor agent, optionally including chat history.
-    
-    Args:
-        chat_history: Optional list of previous messages with 'role' and 'content' keys.
-                      If provided, the chat history will be included in the system prompt.
-        
-    Returns:
-        The system prompt string, with chat history appended if provided
-        
-    Example:
-        >>> # Without history
-        >>> prompt = get_supervisor_system_prompt()
-        
-        >>> # With history
-        >>> history = [{"role": "user", "content": "What is X?"}]
-        >>> prompt = get_supervisor_system_prompt(chat_history=history)
+        The system prompt string, including the current date
     """
     current_date = datetime.now().strftime("%B %d, %Y")
     
@@ -130,7 +87,8 @@ def get_supervisor_system_prompt(chat_history: Optional[List[Dict[str, str]]] =
 
     - Analyze user queries and determine which agent(s) to use
     - Route queries to the appropriate agent(s) — you MUST NOT answer substantive questions directly
-    - For complex queries, coordinate multiple agents in sequence
+    - When a query needs more than one agent, or several independent searches, call those tools together in the same turn; they run in parallel
+    - Only call agents one after another when a later query depends on an earlier agent's answer
     - Synthesize results from multiple agents into coherent answers
     - Prioritize project documents for project-specific questions
     - Use web search ONLY if asked by the user or mentioned in the question
@@ -158,14 +116,6 @@ def get_supervisor_system_prompt(chat_history: Optional[List[Dict[str, str]]] =
     For all other queries, you MUST route to the appropriate agent(s) and synthesize their responses. Your role is coordination and synthesis, not direct knowledge provision.
     """
 
-    if chat_history:
-        formatted_history = format_chat_history(chat_history)
-        if formatted_history:
-            base_prompt += "\n\n### Previous Conversation Context\n"
-            base_prompt += "The following is the recent conversation history for context:\n\n"
-            base_prompt += formatted_history
-            base_prompt += "\n\nUse this conversation history to understand context and references in the current question."
-    
     return base_prompt
 
 
@@ -189,7 +139,7 @@ def create_rag_tool(project_id: str):
     """
     
     @tool
-    def rag_search(
+    async def rag_search(
         query: str,
         tool_call_id: Annotated[str, InjectedToolCallId],
     ) -> Command:
@@ -205,35 +155,33 @@ def create_rag_tool(project_id: str):
             A Command object with updated messages and citations
         """
         try:
-            # Retrieve context using the existing RAG pipeline
-            texts, images, tables, citations = retrieve_context(project_id, query)
-            
+            # Retrieve context and answer using the existing RAG pipeline
+            # (served from the semantic answer cache for repeated questions)
+            # (blocking database and LLM calls, so run in a worker thread to keep the event loop free)
+            response, citations, metrics = await asyncio.to_thread(
+                answer_with_rag, project_id, query
+            )
             # If no context found, return a message
-            if not texts and not images and not tables:
+            if response is None:
                 return Command(
                     update={
                         "messages": [
                             ToolMessage(
                                 "No relevant information found in the project documents for this query.",
+                                artifact={"rag_metrics": metrics},
                                 tool_call_id=tool_call_id
                             )
                         ]
                     }
                 )
                 
-            # Prepare the response using the existing LLM preparation function
-            response = prepare_prompt_and_invoke_llm(
-                user_query=query,
-                texts=texts,
-                images=images,
-                tables=tables
-            )
-        
             return Command(
                 update={
                     "messages": [
                         ToolMessage(
                             content=response,
+                            # Latency and token counts of this search, kept out of the model's context
+                            artifact={"rag_metrics": metrics},
                             tool_call_id=tool_call_id
                         )
                     ],
@@ -366,6 +314,43 @@ Never fabricate information - only use what's found in search results."""
 # Tabular MCP tool
 # =============================================================================
 
+def stage_tabular_files(project_id: str):
+    """
+    Download the project's tabular files (.csv, .sqlite, .db) to the local cache, if not cached yet.
+    Returns (available_files_context, missing_message); missing_message is set when there is nothing to analyze.
+    """
+    db_result = (
+        supabase.table("project_documents")
+        .select("id, filename, s3_key")
+        .eq("project_id", project_id)
+        .execute()
+    )
+    if not db_result.data:
+        return [], "No relevant documents found in this project."
+    
+    tabular_files = [f for f in db_result.data if f["filename"].lower().endswith((".csv", ".sqlite", ".db"))]
+    if not tabular_files:
+        return [], "No relevant tabular files found in this project."
+    
+    # Stage targets files locally
+    available_files_context = []
+    for file_info in tabular_files:
+        s3_key = file_info["s3_key"]
+        filename = file_info["filename"]
+        local_file_path = LOCAL_CACHE_DIR/f"{project_id}_{filename}"
+
+        if not local_file_path.exists():
+            s3_client.download_file(
+                Bucket = appConfig["s3_bucket_name"],
+                Key = s3_key,
+                Filename = str(local_file_path)
+            )
+        available_files_context.append(
+            f"Dataset Name: {filename} available at path: {str(local_file_path)}"
+        )
+    return available_files_context, None
+
+
 def create_tabular_analysis_tool(project_id: str, model: str = "gpt-4o"):
     """
     Spawns a decoupled MCP client connection on-demand to execute tasks against a standalone tabular data analysis service.
@@ -387,35 +372,13 @@ def create_tabular_analysis_tool(project_id: str, model: str = "gpt-4o"):
             tool_call_id: Injected tool call ID for message tracking.
         """
         try:
-            db_result = (
-                supabase.table("project_documents")
-                .select("id, filename, s3_key")
-                .eq("project_id", project_id)
-                .execute()
+            # Database lookup and S3 downloads are blocking; run them in a worker thread so parallel
+            # rag_search / search_web calls keep running on the event loop meanwhile.
+            available_files_context, missing_message = await asyncio.to_thread(
+                stage_tabular_files, project_id
             )
-            if not db_result.data:
-                return Command(update={"messages": [ToolMessage("No relevant documents found in this project.")]})
-            
-            tabular_files = [f for f in db_result.data if f["filename"].lower().endswith((".csv", ".sqlite", ".db"))]
-            if not tabular_files:
-                return Command(update={"messages": ToolMessage("No relevant tabular files found in this project.")})
-            
-            # Stage targets files locally
-            available_files_context = []
-            for file_info in tabular_files:
-                s3_key = file_info["s3_key"]
-                filename = file_info["filename"]
-                local_file_path = LOCAL_CACHE_DIR/f"{project_id}_{filename}"
-
-                if not local_file_path.exists():
-                    s3_client.download_file(
-                        Bucket = appConfig["s3_bucket_name"],
-                        Key = s3_key,
-                        Filename = str(local_file_path)
-                    )
-                available_files_context.append(
-                    f"Dataset Name: {filename} available at path: {str(local_file_path)}"
-                )
+            if missing_message:
+                return Command(update={"messages": [ToolMessage(missing_message, tool_call_id=tool_call_id)]})
             
             # 1. Configure the parameters for your local stdio server
             server_params = StdioServerParameters(
@@ -517,22 +480,34 @@ def create_tabular_analysis_tool(project_id: str, model: str = "gpt-4o"):
         
     return tabular_data_analysis
 
+def last_rag_metrics(messages) -> Dict:
+    """The rag_metrics of the RAG sub-agent's last rag_search ToolMessage, else None."""
+    for message in reversed(messages):
+        artifact = getattr(message, "artifact", None)
+        if isinstance(message, ToolMessage) and isinstance(artifact, dict) and "rag_metrics" in artifact:
+            return artifact["rag_metrics"]
+    return None
+
 def create_supervisor_tools(project_id: str, model: str = "gpt-4o"):
     """
     Create supervisor tools that wrap the specialized agents.
     
-    This function creates two tools for the supervisor:
-    1. rag_search: Wraps the RAG agent for project document search
+    This function creates three tools for the supervisor:
+    1. rag_search: Wraps the RAG agent for project document search (or, in "context"
+       rag_tool_mode, returns the retrieved context directly)
     2. search_web: Wraps the web search agent for internet queries
+    3. tabular_data_analysis: Runs the tabular MCP agent over the project's data files
     
     The supervisor will use these tools to delegate work to specialized agents.
+    All three are async, so when the supervisor requests several in one turn its
+    tool node runs the sub-agents concurrently without blocking the event loop.
     
     Args:
         project_id: The UUID of the project for the RAG agent
         model: The OpenAI model to use for both agents (default: "gpt-4o")
         
     Returns:
-        List of tools (rag_search and search_web) for the supervisor
+        List of tools (rag_search, search_web and tabular_data_analysis) for the supervisor
     """
     # Create the specialized agents
     rag_agent = create_rag_agent(project_id, model)
@@ -541,7 +516,7 @@ def create_supervisor_tools(project_id: str, model: str = "gpt-4o"):
     tabular_tool = create_tabular_analysis_tool(project_id, model)
     
     @tool
-    def rag_search(
+    async def rag_search(
         query: str,
         tool_call_id: Annotated[str, InjectedToolCallId],
     ) -> Command:
@@ -561,14 +536,24 @@ def create_supervisor_tools(project_id: str, model: str = "gpt-4o"):
         Returns:
             Command with relevant information from project documents and citations
         """
-        result = rag_agent.invoke({
-            "messages": [{"role": "user", "content": query}]
-        })
-
-        # Extract the final response
-        final_message = result["messages"][-1]
-        content = final_message.content if hasattr(final_message, 'content') else str(final_message)
-        citations = result.get("citations", [])
+        project_settings, _, _ = await asyncio.to_thread(get_cached_project_state, project_id)
+        if project_settings.get("rag_tool_mode") == RAG_TOOL_MODE_CONTEXT:
+            # The retrieved context is returned as-is, so the supervisor writes the only answer
+            # (a RAG sub-agent would write one from the context first and the supervisor again)
+            response, citations, metrics = await asyncio.to_thread(
+                answer_with_rag, project_id, query
+            )
+            content = response or "No relevant information found in the project documents for this query."
+        else:
+            result = await rag_agent.ainvoke({
+                "messages": [{"role": "user", "content": query}]
+            })
+
+            # Extract the final response
+            final_message = result["messages"][-1]
+            content = final_message.content if hasattr(final_message, 'content') else str(final_message)
+            citations = result.get("citations", [])
+            metrics = last_rag_metrics(result["messages"])
         
         # Return Command that updates both messages AND citations
         return Command(
@@ -576,6 +561,8 @@ def create_supervisor_tools(project_id: str, model: str = "gpt-4o"):
                 "messages": [
                     ToolMessage(
                         content=content,
+                        # Latency and token counts of the search, kept out of the model's context
+                        artifact={"rag_metrics": metrics},
                         tool_call_id=tool_call_id
                     )
                 ],
@@ -583,7 +570,7 @@ def create_supervisor_tools(project_id: str, model: str = "gpt-4o"):
             }
         )
     @tool
-    def search_web(query: str) -> str:
+    async def search_web(query: str) -> str:
         """Search the internet for current information.
         
         Use this when the user asks about:
@@ -599,7 +586,8 @@ def create_supervisor_tools(project_id: str, model: str = "gpt-4o"):
         Returns:
             Relevant information from web search results
         """
-        result = web_agent.invoke({
+        # The search tools are sync; the agent runs them in a worker thread under ainvoke.
+        result = await web_agent.ainvoke({
             "messages": [{"role": "user", "content": query}]
         })
         
@@ -621,7 +609,6 @@ def create_supervisor_tools(project_id: str, model: str = "gpt-4o"):
 def create_supervisor_agent(
     project_id: str,
     # model: str = "gpt-4o",
-    chat_history: Optional[List[Dict[str, str]]] = None
 ):
     """
     Create a supervisor agent that coordinates RAG and web search agents.
@@ -633,16 +620,17 @@ def create_supervisor_agent(
     4. Synthesizing results from multiple agents into coherent answers
     5. Using chat history to understand context and references
     
-    The supervisor has access to two tools:
+    The supervisor has access to three tools:
     - rag_search: For searching project documents
     - search_web: For searching the internet
+    - tabular_data_analysis: For analyzing the project's tabular data files
+    
+    The supervisor holds no per-chat state, so one compiled graph can serve every chat of
+    the project. Chat history is passed per invocation, as the messages before the new
+    user message.
     
     Args:
         project_id: The UUID of the project for the RAG agent
-        model: The OpenAI model to use (default: "gpt-4o")
-        chat_history: Optional list of previous messages with 'role' and 'content' keys.
-                     If provided, the chat history will be included in the system prompt
-                     to provide conversation context.
         
     Returns:
         A configured supervisor agent that can coordinate sub-agents
@@ -650,21 +638,17 @@ def create_supervisor_agent(
     Example:
         >>> # Basic usage without history
         >>> supervisor = create_supervisor_agent("123e4567-e89b-12d3-a456-426614174000")
-        >>> result = supervisor.invoke({
+        >>> result = await supervisor.ainvoke({
         ...     "messages": [{"role": "user", "content": "What does our documentation say about X?"}]
         ... })
         
         >>> # With chat history
-        >>> history = [
-        ...     {"role": "user", "content": "What is attention mechanism?"},
-        ...     {"role": "assistant", "content": "Attention is a mechanism that..."}
-        ... ]
-        >>> supervisor = create_supervisor_agent(
-        ...     project_id="123e4567-e89b-12d3-a456-426614174000",
-        ...     chat_history=history
-        ... )
-        >>> result = supervisor.invoke({
-        ...     "messages": [{"role": "user", "content": "Tell me more about it"}]
+        >>> result = await supervisor.ainvoke({
+        ...     "messages": [
+        ...         {"role": "user", "content": "What is attention mechanism?"},
+        ...         {"role": "assistant", "content": "Attention is a mechanism that..."},
+        ...         {"role": "user", "content": "Tell me more about it"},
+        ...     ]
         ... })
         >>> print(result["messages"][-1].content)
         >>> print(result.get("citations", []))
@@ -673,8 +657,8 @@ def create_supervisor_agent(
     # Get the supervisor tools (wrapped agents)
     tools = create_supervisor_tools(project_id, model=llm)
 
-    # Get the system prompt with optional chat history
-    system_prompt = get_supervisor_system_prompt(chat_history=chat_history)
+    # Chat history arrives as input messages, not in the system prompt
+    system_prompt = get_supervisor_system_prompt()
     
     supervisor = create_agent(
         model=llm,
@@ -51,4 +51,43 @@ appConfig = {
     "redis_url": os.getenv("REDIS_URL"),
     "openai_api_key": os.getenv("OPENAI_API_KEY"),
     "scrapingbee_api_key": os.getenv("SCRAPINGBEE_API_KEY"),
+    # Ingestion tuning
+    "download_spool_max_bytes": int(os.getenv("DOWNLOAD_SPOOL_MAX_BYTES", str(32 * 1024 * 1024))),
+    "s3_download_max_concurrency": int(os.getenv("S3_DOWNLOAD_MAX_CONCURRENCY", "8")),
+    "pdf_pages_per_partition": int(os.getenv("PDF_PAGES_PER_PARTITION", "10")),
+    "pdf_partition_max_workers": int(os.getenv("PDF_PARTITION_MAX_WORKERS", "0")),
+    "summary_max_workers": int(os.getenv("SUMMARY_MAX_WORKERS", "4")),
+    "summary_tokens_per_minute": int(os.getenv("SUMMARY_TOKENS_PER_MINUTE", "150000")),
+    "embedding_batch_max_tokens": int(os.getenv("EMBEDDING_BATCH_MAX_TOKENS", "200000")),
+    "progress_flush_interval_seconds": float(os.getenv("PROGRESS_FLUSH_INTERVAL_SECONDS", "2")),
+    "chunk_insert_batch_size": int(os.getenv("CHUNK_INSERT_BATCH_SIZE", "50")),
+    "chunk_insert_max_bytes": int(os.getenv("CHUNK_INSERT_MAX_BYTES", "4000000")),
+    # Retrieval tuning
+    "retrieval_max_workers": int(os.getenv("RETRIEVAL_MAX_WORKERS", "8")),
+    "hybrid_vector_timeout_seconds": float(os.getenv("HYBRID_VECTOR_TIMEOUT_SECONDS", "10")),
+    "hybrid_keyword_timeout_seconds": float(os.getenv("HYBRID_KEYWORD_TIMEOUT_SECONDS", "5")),
+    "project_cache_ttl_seconds": int(os.getenv("PROJECT_CACHE_TTL_SECONDS", "300")),
+    "project_cache_max_entries": int(os.getenv("PROJECT_CACHE_MAX_ENTRIES", "1000")),
+    "retrieval_cache_ttl_seconds": int(os.getenv("RETRIEVAL_CACHE_TTL_SECONDS", "900")),
+    "retrieval_cache_max_entries": int(os.getenv("RETRIEVAL_CACHE_MAX_ENTRIES", "2000")),
+    "semantic_answer_cache_similarity": float(os.getenv("SEMANTIC_ANSWER_CACHE_SIMILARITY", "0.95")),
+    "semantic_answer_cache_ttl_seconds": int(os.getenv("SEMANTIC_ANSWER_CACHE_TTL_SECONDS", "3600")),
+    "semantic_answer_cache_max_entries_per_project": int(os.getenv("SEMANTIC_ANSWER_CACHE_MAX_ENTRIES_PER_PROJECT", "200")),
+    "semantic_answer_cache_max_projects": int(os.getenv("SEMANTIC_ANSWER_CACHE_MAX_PROJECTS", "500")),
+    "reranking_lexical_weight": float(os.getenv("RERANKING_LEXICAL_WEIGHT", "0.5")),
+    "reranking_batch_size": int(os.getenv("RERANKING_BATCH_SIZE", "32")),
+    "reranking_score_cache_max_entries": int(os.getenv("RERANKING_SCORE_CACHE_MAX_ENTRIES", "20000")),
+    "reranking_score_cache_ttl_seconds": int(os.getenv("RERANKING_SCORE_CACHE_TTL_SECONDS", "3600")),
+    "rag_context_max_chars_per_chunk": int(os.getenv("RAG_CONTEXT_MAX_CHARS_PER_CHUNK", "2000")),
+    # Agent tuning
+    "agent_max_parallel_tool_calls": int(os.getenv("AGENT_MAX_PARALLEL_TOOL_CALLS", "4")),
+    "agent_graph_cache_max_entries": int(os.getenv("AGENT_GRAPH_CACHE_MAX_ENTRIES", "200")),
+    "agent_graph_cache_ttl_seconds": int(os.getenv("AGENT_GRAPH_CACHE_TTL_SECONDS", "3600")),
+    # Local caches
+    "query_embedding_cache_max_entries": int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_ENTRIES", "5000")),
+    "query_embedding_cache_ttl_seconds": int(os.getenv("QUERY_EMBEDDING_CACHE_TTL_SECONDS", "3600")),
+    "query_embedding_cache_redis_enabled": os.getenv("QUERY_EMBEDDING_CACHE_REDIS", "false").lower() == "true",
+    "local_cache_dir": os.getenv("LOCAL_CACHE_DIR", "/tmp/rag_cache"),
+    "embedding_cache_max_entries": int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000")),
+    "summary_cache_max_entries": int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "20000")),
 }
\ No newline at end of file
@@ -25,6 +25,10 @@ class ProjectSettings(BaseModel):
     reranking_model: str = Field(..., description="The reranking model to use")
     vector_weight: float = Field(..., description="The vector weight")
     keyword_weight: float = Field(..., description="The keyword weight")
+    rag_tool_mode: str = Field(
+        "answer",
+        description="What rag_search returns to the agent: a written \"answer\" or the retrieved \"context\"",
+    )
 
 
 class FileUploadRequest(BaseModel):
@@ -1,8 +1,15 @@
 from src.services.supabase import supabase
-import os
+import io
+import json
+import queue
+import tempfile
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from boto3.s3.transfer import TransferConfig
 from src.services.llm import openAI
 from src.services.awsS3 import s3_client
+from src.services.localCache import summary_cache
 from src.config.index import appConfig
 from src.rag.ingestion.utils import (
     partition_document,
@@ -10,11 +17,33 @@ from src.rag.ingestion.utils import (
     separate_content_types,
     get_page_number,
     create_ai_summary,
+    summary_rate_limiter,
+    iter_batches,
+    END_OF_STREAM,
+    save_elements_checkpoint,
+    load_elements_checkpoint,
+    delete_checkpoints,
 )
 from src.models.index import ProcessingStatus
+from src.rag.retrieval.cache import invalidate_project_cache
 from unstructured.chunking.title import chunk_by_title
 from src.services.webSrapper import scrapingbee_client
 
+# Stages whose output is checkpointed to S3 so a retried task can resume after them.
+PARTITIONED_ELEMENTS_CHECKPOINT = "partitioned_elements"
+CHUNKS_CHECKPOINT = "chunks"
+INGESTION_CHECKPOINTS = [PARTITIONED_ELEMENTS_CHECKPOINT, CHUNKS_CHECKPOINT]
+
+# Parallel ranged GETs of 8 MB parts for documents downloaded from S3.
+S3_DOWNLOAD_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=appConfig["s3_download_max_concurrency"],
+)
+
+# OpenAI's hard limit on the number of inputs in a single embeddings request.
+EMBEDDING_MAX_INPUTS_PER_REQUEST = 2048
+
 
 def process_document(document_id: str):
     """
@@ -22,13 +51,17 @@ def process_document(document_id: str):
     * Step 2 : Split the extracted content into chunks.
     * Step 3 : Generate AI summaries for each chunk.
     * Step 4 : Create vector embeddings of chunk and store in PostgreSQL.
+    *   - Steps 3 and 4 are pipelined: summarised chunks stream into embedding and storage.
     * Update the project document record with the processing_status and processing_details as needed.
     *   - `processing_details` : What type of elements or metadata did we retrieve from the document to show in the UI.
+
+    Ingestion is resumable: partitioned elements and chunks are checkpointed to S3, and the
+    stored document_chunks rows are the checkpoint for summaries and embeddings. A retried
+    task skips every stage (and every chunk) that already completed.
     """
 
+    progress_reporter = None
     try:
-        update_status_in_database(document_id, ProcessingStatus.PROCESSING)
-
         document_result = (
             supabase.table("project_documents")
             .select("*")
@@ -41,27 +74,49 @@ def process_document(document_id: str):
             )
         document = document_result.data[0]
 
-        # Step 1 : Download from S3 (file) or Crawl the URL (url) and Extract content.
-        update_status_in_database(document_id, ProcessingStatus.PARTITIONING)
-        elements_summary, elements = download_content_and_partition(
-            document_id, document
+        # The only read of processing_details; from here on every status write is a blind update.
+        progress_reporter = ProgressReporter(
+            document_id, document.get("processing_details")
         )
+        progress_reporter.update(ProcessingStatus.PROCESSING)
 
-        update_status_in_database(
-            document_id,
+        # Step 1 : Download from S3 (file) or Crawl the URL (url) and Extract content.
+        progress_reporter.update(ProcessingStatus.PARTITIONING)
+        elements = load_elements_checkpoint(document_id, PARTITIONED_ELEMENTS_CHECKPOINT)
+        if elements is None:
+            elements_summary, elements, partitioning_details = (
+                download_content_and_partition(document_id, document)
+            )
+            save_elements_checkpoint(
+                document_id, PARTITIONED_ELEMENTS_CHECKPOINT, elements
+            )
+        else:
+            # Strategy and timings were stored by the attempt that did the partitioning.
+            elements_summary = analyze_elements(elements)
+            partitioning_details = (document.get("processing_details") or {}).get(
+                ProcessingStatus.PARTITIONING.value, {}
+            )
+
+        progress_reporter.update(
             ProcessingStatus.CHUNKING,
             {
                 # Storing the partitioning result to showcase in the UI.
                 ProcessingStatus.PARTITIONING.value: {
+                    **partitioning_details,
                     "elements_found": elements_summary,
                 }
             },
         )
 
         # Step 2 : Split the extracted content into chunks.
-        chunks, chunking_metrics = chunk_elements_by_title(elements)
-        update_status_in_database(
-            document_id,
+        chunks = load_elements_checkpoint(document_id, CHUNKS_CHECKPOINT)
+        resuming = chunks is not None
+        if resuming:
+            chunking_metrics = {"total_chunks": len(chunks)}
+        else:
+            chunks, chunking_metrics = chunk_elements_by_title(elements)
+            save_elements_checkpoint(document_id, CHUNKS_CHECKPOINT, chunks)
+        progress_reporter.update(
             ProcessingStatus.SUMMARISING,
             {
                 # Storing the chunking result to showcase in the UI.
@@ -69,73 +124,107 @@ def process_document(document_id: str):
             },
         )
 
-        # Step 3 : Generate AI summaries for chunk which are Having images and tables.
-        processed_chunks = summarise_chunks(chunks, document_id)
-        update_status_in_database(document_id, ProcessingStatus.VECTORIZATION)
-
-        # Step 4 : Create vector embeddings (1536 dimensions per chunk).
-        vectorize_chunks_summary_and_store_in_database(processed_chunks, document_id)
+        # Step 3 & 4 : Generate AI summaries for chunk which are Having images and tables,
+        # create vector embeddings (1536 dimensions per chunk) and store them in the database.
+        # The three stages run as one streaming pipeline and overlap with each other.
+        summarise_vectorize_and_store_chunks(
+            chunks, document_id, progress_reporter, resume=resuming
+        )
 
-        update_status_in_database(document_id, ProcessingStatus.COMPLETED)
+        progress_reporter.update(ProcessingStatus.COMPLETED)
+        # The document is now searchable; drop the project's cached document ids.
+        invalidate_project_cache(document["project_id"])
+        delete_ingestion_checkpoints(document_id)
 
         return {
             "success": True,
             "document_id": document_id,
         }
     except Exception as e:
+        # Don't lose buffered progress: the UI should show how far this attempt got.
+        if progress_reporter:
+            try:
+                progress_reporter.flush()
+            except Exception:
+                pass
         raise Exception(f"Failed to process document {document_id}: {str(e)}")
 
 
-def update_status_in_database(
-    document_id: str, status: ProcessingStatus, details: dict = None
-):
+def delete_ingestion_checkpoints(document_id: str):
     """
-    Update the project document record with the new status and details.
+    Remove a document's S3 checkpoints once no attempt will resume from them: after a
+    successful ingestion, after the last failed retry, or when the document is deleted.
     """
-    try:
-        # Get the project document record
-        document_result = (
-            supabase.table("project_documents")
-            .select("processing_details")
-            .eq("id", document_id)
-            .execute()
-        )
-        if not document_result.data:
-            raise Exception(
-                f"Failed to get project document record with id: {document_id}"
-            )
+    delete_checkpoints(document_id, INGESTION_CHECKPOINTS)
 
-        # Add processing details to the project document record if there are any
-        current_details = {}
-        if document_result.data[0]["processing_details"]:
-            current_details = document_result.data[0]["processing_details"]
 
-        # Add new details if provided
-        if details:
-            current_details.update(
-                details
-            )  # Note : update() - built-in dict method that merges another dictionary into the current one.
+class ProgressReporter:
+    """
+    Coalesces processing_status / processing_details updates for one document.
 
-        # Update the project document record with the new details
-        document_update_result = (
-            supabase.table("project_documents")
-            .update(
-                {
-                    "processing_status": status.value,
-                    "processing_details": current_details,
-                }
-            )
-            .eq("id", document_id)
-            .execute()
-        )
+    The reporter owns the document's processing_details while it is being ingested: it
+    keeps the merged details in memory and writes them with a single UPDATE (no SELECT
+    first). Stage transitions are written immediately; progress within a stage (e.g. one
+    update per summarised chunk) is buffered and written at most every
+    `progress_flush_interval_seconds`. Safe to call from the pipeline threads.
+    """
 
-        if not document_update_result.data:
-            raise Exception(
-                f"Failed to update project document record with id: {document_id}"
+    def __init__(self, document_id: str, processing_details: dict = None):
+        self.document_id = document_id
+        self.details = dict(processing_details or {})
+        self.status = None
+        self.flush_interval = appConfig["progress_flush_interval_seconds"]
+        self.last_flush = 0.0
+        self.dirty = False
+        self.lock = threading.Lock()
+
+    def update(self, status: ProcessingStatus, details: dict = None):
+        with self.lock:
+            stage_transition = status != self.status
+            self.status = status
+
+            # Add new details if provided
+            if details:
+                self.details.update(
+                    details
+                )  # Note : update() - built-in dict method that merges another dictionary into the current one.
+            self.dirty = True
+
+            if (
+                stage_transition
+                or time.monotonic() - self.last_flush >= self.flush_interval
+            ):
+                self._write()
+
+    def flush(self):
+        with self.lock:
+            if self.dirty:
+                self._write()
+
+    def _write(self):
+        """Update the project document record with the new status and details."""
+        try:
+            document_update_result = (
+                supabase.table("project_documents")
+                .update(
+                    {
+                        "processing_status": self.status.value,
+                        "processing_details": self.details,
+                    }
+                )
+                .eq("id", self.document_id)
+                .execute()
             )
 
-    except Exception as e:
-        raise Exception(f"Failed to update status in database: {str(e)}")
+            if not document_update_result.data:
+                raise Exception(
+                    f"Failed to update project document record with id: {self.document_id}"
+                )
+
+            self.dirty = False
+            self.last_flush = time.monotonic()
+        except Exception as e:
+            raise Exception(f"Failed to update status in database: {str(e)}")
 
 
 def download_content_and_partition(document_id: str, document: dict):
@@ -144,41 +233,50 @@ def download_content_and_partition(document_id: str, document: dict):
     if :  Document - Download from S3
     else : URL - Crawl the URL
     Partition into elements like text, tables, images, etc. and analyze the elements summary and upload to db.
+
+    Files are downloaded with parallel ranged GETs into a spooled temporary file: small files
+    never touch the disk, large ones spill to a temp file that is always removed, even when
+    partitioning fails.
     """
     try:
         # Get the project document record
         document_source_type = document["source_type"]
         elements = None
-        temp_file_path = None
+        partitioning_details = {}
         if document_source_type == "file":
             # Download the file from S3
             s3_key = document["s3_key"]
             filename = document["filename"]
             file_type = filename.split(".")[-1].lower()
 
-            # Download the file to a temporary directory - for all OS - Linux , Windows , Mac
-            temp_file_path = f"/tmp/{document_id}.{file_type}"
-            s3_client.download_file(appConfig["s3_bucket_name"], s3_key, temp_file_path)
+            with tempfile.SpooledTemporaryFile(
+                max_size=appConfig["download_spool_max_bytes"]
+            ) as document_file:
+                s3_client.download_fileobj(
+                    appConfig["s3_bucket_name"],
+                    s3_key,
+                    document_file,
+                    Config=S3_DOWNLOAD_CONFIG,
+                )
+                document_file.seek(0)
 
-            elements = partition_document(temp_file_path, file_type)
+                elements, partitioning_details = partition_document(
+                    document_file, file_type
+                )
 
         if document_source_type == "url":
 
             url = document["source_url"]
             # Crawl the URL
             response = scrapingbee_client.get(url)
-            temp_file_path = f"/tmp/{document_id}.html"
-            with open(temp_file_path, "wb") as f:
-                f.write(response.content)
 
-            elements = partition_document(temp_file_path, "html", source_type="url")
+            elements, partitioning_details = partition_document(
+                io.BytesIO(response.content), "html", source_type="url"
+            )
 
         elements_summary = analyze_elements(elements)
 
-        # Delete the temprary file
-        os.remove(temp_file_path)
-
-        return elements_summary, elements
+        return elements_summary, elements, partitioning_details
 
     except Exception as e:
         raise Exception(
@@ -205,166 +303,402 @@ def chunk_elements_by_title(elements):
         raise Exception(f"Failed to chunk elements by title: {str(e)}")
 
 
-def summarise_chunks(chunks, document_id, source_type="file"):
+def summarise_vectorize_and_store_chunks(
+    chunks, document_id, progress_reporter, source_type="file", resume=False
+):
+    """
+    Steps 3 & 4 as a streaming producer/consumer pipeline:
+
+        summarise_chunks  --queue-->  vectorize_chunks_summary  --queue-->  store_chunks_in_database
+        (thread pool)                 (adaptive embedding batches)          (bulk inserts)
+
+    Every summarised chunk flows straight into the embedding batcher and then into the
+    database writer, so end-to-end latency is roughly that of the slowest stage instead of
+    the sum of all three. Returns the stored chunk ids in chunk order.
+
+    With `resume=True` (the chunks came from a checkpoint), chunks that already have a
+    document_chunks row are skipped. Otherwise rows left over from an earlier run of this
+    document are removed first, so re-running never produces duplicate rows.
+    """
+
+    try:
+        if resume:
+            stored_chunks_result = (
+                supabase.table("document_chunks")
+                .select("id, chunk_index")
+                .eq("document_id", document_id)
+                .execute()
+            )
+            stored_chunk_ids_by_index = {
+                row["chunk_index"]: row["id"] for row in stored_chunks_result.data or []
+            }
+        else:
+            supabase.table("document_chunks").delete().eq(
+                "document_id", document_id
+            ).execute()
+            stored_chunk_ids_by_index = {}
+
+        embedding_queue = queue.Queue()
+        storage_queue = queue.Queue()
+        abort = threading.Event()  # Set when any stage fails so the others stop early.
+        started_at = time.monotonic()
+
+        stage_executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="ingestion-stage"
+        )
+        vectorize_future = stage_executor.submit(
+            vectorize_chunks_summary, embedding_queue, storage_queue, abort
+        )
+        store_future = stage_executor.submit(
+            store_chunks_in_database, storage_queue, abort
+        )
+
+        try:
+            summarising_metrics = summarise_chunks(
+                chunks,
+                document_id,
+                progress_reporter,
+                embedding_queue,
+                abort,
+                source_type,
+                skip_chunk_indexes=set(stored_chunk_ids_by_index),
+            )
+            embedding_queue.put(END_OF_STREAM)
+
+            # Every chunk is summarised; embeddings and inserts are draining.
+            progress_reporter.update(
+                ProcessingStatus.VECTORIZATION,
+                {
+                    # Storing the summarising throughput to showcase in the UI.
+                    ProcessingStatus.SUMMARISING.value: summarising_metrics,
+                },
+            )
+
+            embedding_metrics = vectorize_future.result()
+            new_chunk_ids_by_index, storage_metrics = store_future.result()
+            stored_chunk_ids_by_index.update(new_chunk_ids_by_index)
+        except Exception as e:
+            abort.set()
+            # Surface the stage that actually failed rather than the one that noticed.
+            for future in (vectorize_future, store_future):
+                if future.done() and future.exception():
+                    raise future.exception()
+            raise e
+        finally:
+            stage_executor.shutdown(wait=True)
+
+        progress_reporter.update(
+            ProcessingStatus.VECTORIZATION,
+            {
+                # Storing the vectorization result to showcase in the UI.
+                ProcessingStatus.VECTORIZATION.value: {
+                    **embedding_metrics,
+                    **storage_metrics,
+                    # Process-wide counters (shared by every document this worker has embedded).
+                    "embedding_cache": openAI["embeddings"].stats(),
+                    "pipeline_duration_seconds": round(time.monotonic() - started_at, 2),
+                },
+            },
+        )
+
+        return [
+            stored_chunk_ids_by_index[index] for index in sorted(stored_chunk_ids_by_index)
+        ]
+    except Exception as e:
+        raise Exception(f"Failed to summarise, vectorize and store chunks: {str(e)}")
+
+
+def summarise_chunks(
+    chunks,
+    document_id,
+    progress_reporter,
+    output_queue,
+    abort,
+    source_type="file",
+    skip_chunk_indexes=frozenset(),
+):
     """
     Create user-friendly, searchable chunks.
 
     For each chunk we optionally generate an AI summary (useful for mixed content like
     tables/images) and update the UI to better UX as each chunk will take at least 5 seconds to process.
+
+    Chunks are summarised concurrently by a bounded thread pool (`summary_max_workers`) that
+    shares the worker process's token budget (`summary_tokens_per_minute`, across all
+    documents being ingested). Each finished chunk is pushed to
+    `output_queue` as a document_chunks row (without its embedding yet).
+    Chunks in `skip_chunk_indexes` were stored by an earlier attempt and are not redone.
     """
 
     try:
-        processed_chunks = []
         total_chunks = len(chunks)
+        ai_summaries = 0
+        max_workers = max(1, appConfig["summary_max_workers"])
+        started_at = time.monotonic()
+
+        executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="summarise"
+        )
+        try:
+            futures = {
+                executor.submit(summarise_chunk, chunk, i, source_type, summary_rate_limiter): i
+                for i, chunk in enumerate(chunks)
+                if i not in skip_chunk_indexes
+            }
 
-        for i, chunk in enumerate(chunks):
-            current_chunk = i + 1
+            # Chunks finish out of order; only the main thread talks to the database.
+            for completed, future in enumerate(
+                as_completed(futures), start=len(chunks) - len(futures) + 1
+            ):
+                if abort.is_set():
+                    raise Exception("Aborted: a downstream ingestion stage failed")
+
+                processed_chunk, used_ai_summary = future.result()
+                ai_summaries += used_ai_summary
+
+                # chunk_index comes from the original position, so out-of-order completion is fine.
+                output_queue.put(
+                    {
+                        **processed_chunk,
+                        "document_id": document_id,
+                        "chunk_index": futures[future],
+                    }
+                )
 
-            # Progress updates for the UI polling loop; keeps the user informed.
-            update_status_in_database(
-                document_id,
-                ProcessingStatus.SUMMARISING,
-                {
-                    ProcessingStatus.SUMMARISING.value: {
-                        "current_chunk": current_chunk,
-                        "total_chunks": total_chunks,
+                # Progress updates for the UI polling loop; keeps the user informed.
+                # The reporter throttles these to one database write every few seconds.
+                progress_reporter.update(
+                    ProcessingStatus.SUMMARISING,
+                    {
+                        ProcessingStatus.SUMMARISING.value: {
+                            "current_chunk": completed,
+                            "total_chunks": total_chunks,
+                        },
                     },
-                },
-            )
-
-            # Normalize the raw chunk into typed content buckets (text/tables/images, etc.).
-            # content_data = {
-            #     "text": "This is the main text content of the chunk...",
-            #     "tables": ["<table><tr><th>Header</th></tr><tr><td>Data</td></tr></table>"],
-            #     "images": ["iVBORw0KGgoAAAANSUhEUgAA..."],  # base64 encoded image strings
-            #     "types": ["text", "table", "image"]  # or ["text"], ["text", "table"], etc.
-            # }
-            content_data = separate_content_types(chunk, source_type)
-
-            # * Use AI summarization only when the chunk contains at least one table or image.
-            if content_data["tables"] or content_data["images"]:
-                enhanced_content = create_ai_summary(
-                    content_data["text"], content_data["tables"], content_data["images"]
                 )
-            else:
-                enhanced_content = content_data["text"]
-
-            # Preserve the original content structure for traceability in the UI.
-            original_content = {"text": content_data["text"]}
-            if content_data["tables"]:
-                original_content["tables"] = content_data["tables"]
-            if content_data["images"]:
-                original_content["images"] = content_data["images"]
-
-            # Assemble the final searchable unit with minimal but useful metadata.
-            processed_chunk = {
-                "content": enhanced_content,
-                "original_content": original_content,
-                "type": content_data["types"],
-                "page_number": get_page_number(chunk, i),
-                "char_count": len(enhanced_content),
-            }
+        finally:
+            # On failure, drop the chunks that have not started yet.
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        duration_seconds = time.monotonic() - started_at
+        summarising_metrics = {
+            "current_chunk": total_chunks,
+            "total_chunks": total_chunks,
+            "ai_summaries": ai_summaries,
+            "resumed_chunks": total_chunks - len(futures),
+            "max_workers": max_workers,
+            # Process-wide counters (shared by every document this worker has summarised).
+            "summary_cache": summary_cache.stats(),
+            "duration_seconds": round(duration_seconds, 2),
+            "chunks_per_second": (
+                round(total_chunks / duration_seconds, 2) if duration_seconds else None
+            ),
+        }
 
-            # Rough example for processed_chunk:
-            # {
-            #     "content": "AI-enhanced summary of the chunk... Image looks like this: <image_base64> ... Table looks like this: <table_html> ...",
-            #     "original_content": {
-            #         "text": "Full paragraph of the chunk...",
-            #         "tables": ["<table><tr><th>Region</th><th>Revenue</th></tr><tr><td>APAC</td><td>$1.2M</td></tr></table>"],
-            #         "images": ["iVBORw0KGgoAAA...base64..."]
-            #     },
-            #     "type": ["text", "table", "image"],
-            #     "page_number": 3,
-            #     "char_count": 142
-            # }
-
-            processed_chunks.append(processed_chunk)
-
-        return processed_chunks
+        return summarising_metrics
     except Exception as e:
         raise Exception(f"Failed to summarise chunks: {str(e)}")
 
 
-def vectorize_chunks_summary_and_store_in_database(processed_chunks, document_id):
-    """Generate vector embeddings of the ai-summary of the chunks and store in the database."""
+def summarise_chunk(chunk, chunk_index, source_type, rate_limiter):
+    """
+    Turn a single chunk into a searchable unit. Runs inside the summarisation thread pool.
+    Returns the processed chunk and whether an AI summary was generated for it.
+    """
 
-    try:
-        # processed_chunks example (list of dicts):
+    # Normalize the raw chunk into typed content buckets (text/tables/images, etc.).
+    # content_data = {
+    #     "text": "This is the main text content of the chunk...",
+    #     "tables": ["<table><tr><th>Header</th></tr><tr><td>Data</td></tr></table>"],
+    #     "images": ["iVBORw0KGgoAAAANSUhEUgAA..."],  # base64 encoded image strings
+    #     "types": ["text", "table", "image"]  # or ["text"], ["text", "table"], etc.
+    # }
+    content_data = separate_content_types(chunk, source_type)
+
+    # * Use AI summarization only when the chunk contains at least one table or image.
+    ai_summary = bool(content_data["tables"] or content_data["images"])
+    if ai_summary:
+        # Simple retry with exponential backoff, so one flaky chunk doesn't fail the document.
+        attempt = 0
+        while True:
+            try:
+                enhanced_content = create_ai_summary(
+                    content_data["text"],
+                    content_data["tables"],
+                    content_data["images"],
+                    rate_limiter=rate_limiter,
+                )
+                break
+            except Exception as e:
+                attempt += 1
+                if attempt >= 3:
+                    raise Exception(f"Chunk {chunk_index}: {str(e)}")
+                time.sleep(2**attempt)
+    else:
+        enhanced_content = content_data["text"]
+
+    # Preserve the original content structure for traceability in the UI.
+    original_content = {"text": content_data["text"]}
+    if content_data["tables"]:
+        original_content["tables"] = content_data["tables"]
+    if content_data["images"]:
+        original_content["images"] = content_data["images"]
+
+    # Assemble the final searchable unit with minimal but useful metadata.
+    # Rough example for processed_chunk:
+    # {
+    #     "content": "AI-enhanced summary of the chunk... Image looks like this: <image_base64> ... Table looks like this: <table_html> ...",
+    #     "original_content": {
+    #         "text": "Full paragraph of the chunk...",
+    #         "tables": ["<table><tr><th>Region</th><th>Revenue</th></tr><tr><td>APAC</td><td>$1.2M</td></tr></table>"],
+    #         "images": ["iVBORw0KGgoAAA...base64..."]
+    #     },
+    #     "type": ["text", "table", "image"],
+    #     "page_number": 3,
+    #     "char_count": 142
+    # }
+    processed_chunk = {
+        "content": enhanced_content,
+        "original_content": original_content,
+        "type": content_data["types"],
+        "page_number": get_page_number(chunk, chunk_index),
+        "char_count": len(enhanced_content),
+    }
+
+    return processed_chunk, ai_summary
+
+
+def vectorize_chunks_summary(input_queue, output_queue, abort):
+    """
+    Generate vector embeddings of the ai-summary of the chunks as they arrive from summarisation.
 
-        # processed chunks = [{
+    Batches are sized adaptively up to `embedding_batch_max_tokens` (and the provider's
+    2048 inputs per request), then every embedded row is passed on to the database writer.
+    """
+
+    try:
+        # Chunk rows arriving from summarise_chunks (document_chunks columns minus the embedding):
+        # {
         #     "content": "Ai-enhanced summary of the chunk...", <----- **This is the content that will be vectorized.**
         #     "original_content": {"text": "...", "tables": ["<table...>"], "images": ["<base64>"]},
         #     "type": ["text", "table", "image"],
         #     "page_number": 3,
-        #     "char_count": 142
-        # }, {....}]
-        # Step 1 : Vectorizing Chunks
-        ai_summary_list = [chunk["content"] for chunk in processed_chunks]
-        # ai_summary_list = ["Ai-enhanced summary of the chunk...", "Ai-enhanced summary of the chunk...", ...]
-
-        # Edge case : More chunks < More API calls. In Case we exceed the API limit. We will generate in batches.
-        batch_size = 10
-        all_vectorized_embeddings = []
-
-        for start in range(0, len(ai_summary_list), batch_size):
-
-            # Splits into chunks of batch_size - 10
-            end = start + batch_size
-            batch_texts = ai_summary_list[start:end]  # We get the chunks of 10 or less.
-
-            # Simple retry with exponential backoff
-            attempt = 0
-            while True:
-                try:
-                    embeddings = openAI["embeddings"].embed_documents(batch_texts)
-                    # As
-                    all_vectorized_embeddings.extend(
-                        embeddings
-                    )  # 'extend' - built-in list method that adds multiple elements to the end of the list.
-                    break
-                except Exception as e:
-                    attempt += 1
-                    if attempt >= 3:
-                        raise e
-                    time.sleep(2**attempt)
-
-        # Step 2 : Storing Chunks with Embeddings
-        # chunk_embedding_pairs: list of tuples (processed_chunk, embedding_vector)
-        # Example:
-        # [
-        #     ({"content": "...", "page_number": 1, "type": ["text"]}, [0.123, -0.456, 0.789, ...]),
-        #     ({"content": "...", "page_number": 2, "type": ["text", "table"]}, [0.234, -0.567, 0.890, ...]),
-        #     ...
-        # ]
-        chunk_embedding_pairs = list(zip(processed_chunks, all_vectorized_embeddings))
-        stored_chunk_ids = []
-
-        for i, (processed_chunk, embedding_vector) in enumerate(chunk_embedding_pairs):
-            # Add document_id, chunk_index, and embedding to each processed_chunk
-            # chunk_data_with_embedding example:
-            # {
-            #     * Same as above but added document_id, chunk_index, and embedding.
-            #     "content": "AI-enhanced summary of the chunk...","original_content": {"text": "...", "tables": ["<table>...</table>"], "images": ["<base64>"]},"type": ["text", "table", "image"],"page_number": 3,"char_count": 142,
-            #     "document_id": "doc_123",
-            #     "chunk_index": 0,
-            #     "embedding": [0.123, -0.456, 0.789, 0.234, ...]  # 1536 dimensions
-            # }
-            chunk_data_with_embedding = {
-                **processed_chunk,
-                "document_id": document_id,
-                "chunk_index": i,
-                "embedding": embedding_vector,
-            }
+        #     "char_count": 142,
+        #     "document_id": "doc_123",
+        #     "chunk_index": 0,
+        # }
+        embedding_requests = 0
+        embedded_chunks = 0
+
+        for batch in iter_batches(
+            input_queue,
+            abort,
+            max_items=EMBEDDING_MAX_INPUTS_PER_REQUEST,
+            max_weight=appConfig["embedding_batch_max_tokens"],
+            # ~3 characters per token keeps us safely under the limit for non-English text too.
+            weight_of=lambda chunk_row: len(chunk_row["content"]) // 3 + 1,
+        ):
+            embeddings = embed_documents_with_retry(
+                [chunk_row["content"] for chunk_row in batch]
+            )
+            embedding_requests += 1
+            embedded_chunks += len(batch)
+
+            for chunk_row, embedding_vector in zip(batch, embeddings):
+                # "embedding": [0.123, -0.456, 0.789, 0.234, ...]  # 1536 dimensions
+                output_queue.put({**chunk_row, "embedding": embedding_vector})
+
+        output_queue.put(END_OF_STREAM)
+
+        return {
+            "embedding_requests": embedding_requests,
+            "embedded_chunks": embedded_chunks,
+        }
+    except Exception as e:
+        abort.set()
+        raise Exception(f"Failed to vectorize chunks: {str(e)}")
+
+
+def embed_documents_with_retry(texts):
+    """Embed one batch of texts with a simple exponential backoff retry."""
+
+    attempt = 0
+    while True:
+        try:
+            return openAI["embeddings"].embed_documents(texts)
+        except Exception as e:
+            attempt += 1
+            if attempt >= 3:
+                raise e
+            time.sleep(2**attempt)
+
+
+def store_chunks_in_database(input_queue, abort):
+    """
+    Bulk insert embedded document_chunks rows as they arrive and return {chunk_index: id}.
+
+    Rows are grouped into batches of at most `chunk_insert_batch_size` rows and
+    `chunk_insert_max_bytes` of JSON (chunks with base64 images can be several MB each),
+    so a document lands in a handful of PostgREST requests instead of one per chunk.
+    """
+
+    try:
+        stored_chunk_ids_by_index = {}
+        insert_requests = 0
+
+        for batch in iter_batches(
+            input_queue,
+            abort,
+            max_items=max(1, appConfig["chunk_insert_batch_size"]),
+            max_weight=appConfig["chunk_insert_max_bytes"],
+            weight_of=lambda chunk_row: len(json.dumps(chunk_row)),
+        ):
+            stored_ids = insert_chunk_batch(batch)
+            insert_requests += 1
+            for chunk_row, stored_id in zip(batch, stored_ids):
+                stored_chunk_ids_by_index[chunk_row["chunk_index"]] = stored_id
+
+        return stored_chunk_ids_by_index, {"insert_requests": insert_requests}
+    except Exception as e:
+        abort.set()
+        raise Exception(f"Failed to store chunks in database: {str(e)}")
+
+
+def insert_chunk_batch(batch):
+    """
+    Insert one batch of document_chunks rows with retries.
+
+    Rows are upserted on (document_id, chunk_index), so retrying a request that actually
+    succeeded (e.g. a timeout after commit) overwrites the same rows instead of duplicating them.
+
+    If the batch keeps failing, it is split in half and each half is retried on its own,
+    so one bad row (e.g. an oversized payload) only costs a few extra requests instead of
+    failing every chunk that happened to share its batch.
+    """
 
+    # Simple retry with exponential backoff
+    attempt = 0
+    while True:
+        try:
             result = (
                 supabase.table("document_chunks")
-                .insert(chunk_data_with_embedding)
+                .upsert(batch, on_conflict="document_id,chunk_index")
                 .execute()
             )
-            stored_chunk_ids.append(result.data[0]["id"])
-
-        # print(f"Successfully stored {len(processed_chunks)} chunks with embeddings")
-        return stored_chunk_ids
-
-    except Exception as e:
-        raise Exception(f"Failed to vectorize chunks and store in database: {str(e)}")
+            if len(result.data) != len(batch):
+                raise Exception(
+                    f"Inserted {len(result.data)} of {len(batch)} chunks"
+                )
+            return [row["id"] for row in result.data]
+        except Exception as e:
+            attempt += 1
+            if attempt >= 3:
+                if len(batch) == 1:
+                    raise Exception(
+                        f"Failed to insert chunk {batch[0]['chunk_index']}: {str(e)}"
+                    )
+                break
+            time.sleep(2**attempt)
+
+    middle = len(batch) // 2
+    return insert_chunk_batch(batch[:middle]) + insert_chunk_batch(batch[middle:])
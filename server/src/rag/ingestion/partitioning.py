@@ -0,0 +1,200 @@
+import io
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from pypdf import PdfReader, PdfWriter
+from unstructured.partition.pdf import partition_pdf
+
+# ! Keep this module free of service imports (Supabase, OpenAI, S3...).
+# The partition pool workers are spawned processes that import it, and they only need
+# unstructured and pypdf.
+
+# Per-strategy partition_pdf options. "fast" reads the embedded text layer directly and is
+# an order of magnitude quicker, but extracts neither images nor table structure.
+PDF_PARTITION_OPTIONS = {
+    "hi_res": {
+        "strategy": "hi_res",  # Most accurate (but slower) processing method of extraction.
+        "infer_table_structure": True,  # Keep tables as structured HTML, not jumbled text.
+        "extract_image_block_types": ["Image"],  # Grab images found in pdf.
+        "extract_image_block_to_payload": True,  # Store images as base64 strings in the payload.
+    },
+    "fast": {
+        "strategy": "fast",
+    },
+}
+
+# Pages with less extractable text than this are treated as scanned / outlined text.
+MIN_TEXT_LAYER_CHARS = 20
+
+_partition_pool = None
+_partition_pool_lock = threading.Lock()
+
+
+def get_partition_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool shared by every document this worker ingests.
+
+    Reusing the pool means each process loads the hi_res layout model once instead of once
+    per document. "spawn" rather than "fork", because forking the multi-threaded Celery
+    worker can deadlock on locks held by other threads.
+    """
+    global _partition_pool
+    with _partition_pool_lock:
+        if _partition_pool is None:
+            _partition_pool = ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _partition_pool
+
+
+def reset_partition_pool(broken_pool: ProcessPoolExecutor):
+    global _partition_pool
+    with _partition_pool_lock:
+        if _partition_pool is broken_pool:
+            _partition_pool = None
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+
+
+def choose_page_strategy(page) -> str:
+    """
+    Pre-scan a single pypdf page and pick the partitioning strategy it needs.
+
+    "hi_res" when the page has images, no usable text layer (scanned) or looks like it
+    contains a table; "fast" for plain text pages.
+    """
+    try:
+        if len(page.images) > 0:
+            return "hi_res"
+
+        text = page.extract_text() or ""
+        if len(text.strip()) < MIN_TEXT_LAYER_CHARS:
+            return "hi_res"
+
+        if looks_like_table(text):
+            return "hi_res"
+
+        return "fast"
+    except Exception:
+        # If pypdf can't read the page, let the layout model deal with it.
+        return "hi_res"
+
+
+def looks_like_table(text: str) -> bool:
+    """Heuristic: a good share of the lines carry three or more numeric cells."""
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) < 3:
+        return False
+
+    def is_numeric(token):
+        token = token.strip("$%()").replace(",", "").lstrip("-")
+        return token.replace(".", "", 1).isdigit()
+
+    numeric_lines = sum(
+        1 for line in lines if sum(is_numeric(token) for token in line.split()) >= 3
+    )
+    return numeric_lines / len(lines) >= 0.3
+
+
+def group_page_ranges(page_strategies, pages_per_split: int):
+    """
+    Group consecutive pages that share a strategy into ranges of at most `pages_per_split`
+    pages (no cap when 0). Returns [(first_page_index, end_page_index, strategy), ...].
+    """
+    page_ranges = []
+    for page_index, strategy in enumerate(page_strategies):
+        if page_ranges:
+            start, end, range_strategy = page_ranges[-1]
+            if range_strategy == strategy and (
+                pages_per_split <= 0 or end - start < pages_per_split
+            ):
+                page_ranges[-1] = (start, end + 1, strategy)
+                continue
+        page_ranges.append((page_index, page_index + 1, strategy))
+
+    return page_ranges
+
+
+def write_page_range(reader: PdfReader, start: int, end: int) -> bytes:
+    """Copy pages [start, end) into a standalone PDF."""
+    writer = PdfWriter()
+    for page in reader.pages[start:end]:
+        writer.add_page(page)
+
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def partition_pdf_page_range(pdf_bytes: bytes, starting_page_number: int, strategy: str):
+    """Partition one page range. Runs inside a pool process."""
+    return partition_pdf(
+        file=io.BytesIO(pdf_bytes),
+        # Keeps page_number metadata relative to the whole document, not the range.
+        starting_page_number=starting_page_number,
+        **PDF_PARTITION_OPTIONS[strategy],
+    )
+
+
+def partition_pdf_document(file, pages_per_split: int, max_workers: int = 0):
+    """
+    Partition a PDF with a strategy picked per page, in parallel across all cores.
+
+    Every page is pre-scanned (text layer, images, table likelihood) and gets "fast" or
+    "hi_res". Consecutive pages with the same strategy form page ranges of at most
+    `pages_per_split` pages (0 = no cap); the ranges are partitioned in the process pool
+    and the element lists are concatenated back in page order.
+
+    Returns the elements and the partitioning details shown in the UI:
+    {"strategy": "fast" | "hi_res" | "hybrid", "fast_pages", "hi_res_pages", "scan_seconds"}
+    """
+    scan_started_at = time.monotonic()
+    reader = PdfReader(file)
+    page_strategies = [choose_page_strategy(page) for page in reader.pages]
+    page_ranges = group_page_ranges(page_strategies, pages_per_split)
+
+    fast_pages = page_strategies.count("fast")
+    hi_res_pages = len(page_strategies) - fast_pages
+    partitioning_details = {
+        "strategy": (
+            "hybrid" if fast_pages and hi_res_pages else "fast" if fast_pages else "hi_res"
+        ),
+        "fast_pages": fast_pages,
+        "hi_res_pages": hi_res_pages,
+        "scan_seconds": round(time.monotonic() - scan_started_at, 2),
+    }
+
+    # Single range: no need to split the file or pay for inter-process transfer.
+    if len(page_ranges) <= 1:
+        strategy = page_ranges[0][2] if page_ranges else "hi_res"
+        file.seek(0)  # The pre-scan read the whole file.
+        elements = partition_pdf(file=file, **PDF_PARTITION_OPTIONS[strategy])
+        return elements, partitioning_details
+
+    pool = get_partition_pool(max_workers)
+    futures = [
+        pool.submit(
+            partition_pdf_page_range,
+            write_page_range(reader, start, end),
+            start + 1,
+            strategy,
+        )
+        for start, end, strategy in page_ranges
+    ]
+
+    try:
+        elements = []
+        for future in futures:  # Submission order == page order.
+            elements.extend(future.result())
+        return elements, partitioning_details
+    except Exception as e:
+        for future in futures:
+            future.cancel()
+        if isinstance(e, BrokenProcessPool):
+            # A crashed worker (e.g. OOM-killed) breaks the pool for good; start fresh next time.
+            reset_partition_pool(pool)
+        raise
@@ -1,51 +1,89 @@
 from unstructured.partition.html import partition_html
-from unstructured.partition.pdf import partition_pdf
 from unstructured.partition.docx import partition_docx
 from unstructured.partition.pptx import partition_pptx
 from unstructured.partition.text import partition_text
 from unstructured.partition.md import partition_md
+from unstructured.staging.base import elements_to_json, elements_from_json
+
+import gzip
+import hashlib
+import queue
+import threading
+import time
+import zipfile
 
 from src.services.llm import openAI
+from src.services.localCache import summary_cache
+from src.services.awsS3 import s3_client
+from src.config.index import appConfig
+from src.rag.ingestion.partitioning import partition_pdf_document
 from langchain_core.messages import HumanMessage
 
 
-def partition_document(temp_file: str, file_type: str, source_type: str = "file"):
-    """Partition document based on file type and source type"""
+def partition_document(file, file_type: str, source_type: str = "file"):
+    """
+    Partition document based on file type and source type.
+    `file` is a seekable binary file-like object (spooled download or in-memory bytes).
+
+    Returns the elements and the partitioning details (chosen strategy and time spent)
+    that are stored in processing_details.
+    """
+
+    started_at = time.monotonic()
+    partitioning_details = {"strategy": "default"}
 
     source = (source_type or "file").lower()
+    kind = (file_type or "").lower()
     if source == "url":
-        return partition_html(
-            filename=temp_file,
+        elements = partition_html(
+            file=file,
         )
 
-    kind = (file_type or "").lower()
-    dispatch = {
-        "pdf": lambda: partition_pdf(
-            filename=temp_file,
-            strategy="hi_res",  # Most accurate (but slower) processing method of extraction.
-            infer_table_structure=True,  # Keep tables as structured HTML, not jumbled text.
-            extract_image_block_types=["Image"],  # Grab images found in pdf.
-            extract_image_block_to_payload=True,  # Store images as base64 strings in the payload.
-        ),
-        "docx": lambda: partition_docx(
-            filename=temp_file,
-            strategy="hi_res",
+    elif kind == "pdf":
+        # Strategy is picked per page; large PDFs are partitioned across all cores.
+        elements, partitioning_details = partition_pdf_document(
+            file,
+            pages_per_split=appConfig["pdf_pages_per_partition"],
+            max_workers=appConfig["pdf_partition_max_workers"],
+        )
+
+    elif kind in ("docx", "pptx"):
+        # hi_res only pays off for embedded images; text-only files go through "fast".
+        strategy = "hi_res" if office_document_has_media(file, kind) else "fast"
+        partitioning_details = {"strategy": strategy}
+        partition_office_document = partition_docx if kind == "docx" else partition_pptx
+        elements = partition_office_document(
+            file=file,
+            strategy=strategy,
             infer_table_structure=True,
             # ! Note : We haven't implemented image extraction for docx,pptx ,md files.
-        ),
-        "pptx": lambda: partition_pptx(
-            filename=temp_file,
-            strategy="hi_res",
-            infer_table_structure=True,
-        ),
-        "txt": lambda: partition_text(filename=temp_file),
-        "md": lambda: partition_md(filename=temp_file),
-    }
+        )
+
+    elif kind == "txt":
+        elements = partition_text(file=file)
 
-    if kind not in dispatch:
+    elif kind == "md":
+        elements = partition_md(file=file)
+
+    else:
         raise ValueError(f"Unsupported file_type: {file_type}")
 
-    return dispatch[kind]()
+    partitioning_details["duration_seconds"] = round(time.monotonic() - started_at, 2)
+
+    return elements, partitioning_details
+
+
+def office_document_has_media(file, kind: str) -> bool:
+    """docx/pptx files are zip archives; embedded images live under word/media or ppt/media."""
+    media_prefix = "word/media/" if kind == "docx" else "ppt/media/"
+    try:
+        with zipfile.ZipFile(file) as archive:
+            return any(name.startswith(media_prefix) for name in archive.namelist())
+    except zipfile.BadZipFile:
+        return True
+    finally:
+        # Rewind for the partitioner that reads the same file next.
+        file.seek(0)
 
 
 def analyze_elements(elements):
@@ -145,10 +183,40 @@ def get_page_number(chunk, chunk_index):
     return chunk_index + 1
 
 
-def create_ai_summary(text, tables_html, images_base64):
-    """Create AI-enhanced summary for tables and images present in the chunks"""
+def ai_summary_cache_key(text, tables_html, images_base64):
+    """Hash of everything that goes into a create_ai_summary request, including the model"""
+
+    hasher = hashlib.sha256()
+    parts = [openAI["embeddings_llm"].model_name, text, *tables_html, *images_base64]
+    for part in parts:
+        # Length-prefix every part so ("ab", "c") and ("a", "bc") hash differently.
+        encoded = part.encode("utf-8")
+        hasher.update(len(encoded).to_bytes(8, "big"))
+        hasher.update(encoded)
+    hasher.update(f"{len(tables_html)}:{len(images_base64)}".encode("utf-8"))
+
+    return hasher.hexdigest()
+
+
+def create_ai_summary(text, tables_html, images_base64, rate_limiter=None):
+    """
+    Create AI-enhanced summary for tables and images present in the chunks.
+
+    Summaries are cached on disk by a hash of the prompt inputs, so retries and duplicate
+    uploads of the same content skip the LLM call (and the rate budget) entirely.
+    """
 
     try:
+        cache_key = ai_summary_cache_key(text, tables_html, images_base64)
+        cached_summary = summary_cache.get(cache_key)
+        if cached_summary is not None:
+            return cached_summary.decode("utf-8")
+
+        if rate_limiter:
+            rate_limiter.acquire(
+                estimate_summary_tokens(text, tables_html, images_base64)
+            )
+
         # Build the text prompt with more efficient instructions
         prompt_text = f"""
             Create a searchable index for this document content.
@@ -204,7 +272,159 @@ def create_ai_summary(text, tables_html, images_base64):
         message = HumanMessage(content=message_content)
         response = openAI["embeddings_llm"].invoke([message])
 
+        summary_cache.set(cache_key, response.content.encode("utf-8"))
+
         return response.content
 
     except Exception as e:
         raise Exception(f"Failed to create AI summary: {str(e)}")
+
+
+def estimate_summary_tokens(text, tables_html, images_base64):
+    """Rough token estimate of a create_ai_summary request, used for rate budgeting"""
+
+    # ~4 characters per token for English text and HTML.
+    prompt_tokens = (len(text) + sum(len(table) for table in tables_html)) // 4
+    # gpt-4o-mini bills a high-detail image at roughly 765 tokens (1024x1024).
+    image_tokens = 765 * len(images_base64)
+    # Prompt instructions (~300) + the 250-400 word search index we ask for (~600).
+    overhead_tokens = 900
+
+    return prompt_tokens + image_tokens + overhead_tokens
+
+
+class TokenRateLimiter:
+    """
+    Thread-safe token bucket shared by the summarisation workers.
+
+    The bucket holds up to `tokens_per_minute` tokens and refills continuously.
+    `acquire` blocks until the requested budget is available, so concurrent workers
+    stay under the provider's TPM limit instead of failing with 429s.
+    """
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = max(1, tokens_per_minute)
+        self.refill_per_second = self.capacity / 60.0
+        self.available = float(self.capacity)
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        # A single request larger than the whole bucket would wait forever.
+        tokens = min(tokens, self.capacity)
+
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.available = min(
+                    self.capacity,
+                    self.available + (now - self.last_refill) * self.refill_per_second,
+                )
+                self.last_refill = now
+
+                if self.available >= tokens:
+                    self.available -= tokens
+                    return
+
+                wait_seconds = (tokens - self.available) / self.refill_per_second
+
+            time.sleep(wait_seconds)
+
+
+# One bucket per worker process: the Celery worker runs documents concurrently in threads,
+# so a bucket per document would multiply the summary budget by the number of tasks.
+summary_rate_limiter = TokenRateLimiter(appConfig["summary_tokens_per_minute"])
+
+
+# Sentinel pushed by a pipeline stage once it has produced its last item.
+END_OF_STREAM = object()
+
+
+def iter_batches(source_queue, abort, max_items, max_weight, weight_of, linger_seconds=0.5):
+    """
+    Group items from a pipeline queue into batches bounded by count and weight.
+
+    Batch sizes adapt to the producer: when items arrive faster than the consumer
+    handles them they pile up in the queue and batches fill up to the limits; when the
+    producer is slow, a partial batch is flushed after `linger_seconds` without new items
+    so downstream stages never sit idle. Stops on END_OF_STREAM or once `abort` is set.
+    """
+
+    batch = []
+    batch_weight = 0
+
+    while not abort.is_set():
+        try:
+            item = source_queue.get(timeout=linger_seconds)
+        except queue.Empty:
+            if batch:
+                yield batch
+                batch, batch_weight = [], 0
+            continue
+
+        if item is END_OF_STREAM:
+            if batch:
+                yield batch
+            return
+
+        item_weight = weight_of(item)
+        # An item heavier than max_weight still goes through, just on its own.
+        if batch and (len(batch) >= max_items or batch_weight + item_weight > max_weight):
+            yield batch
+            batch, batch_weight = [], 0
+
+        batch.append(item)
+        batch_weight += item_weight
+
+
+def get_checkpoint_key(document_id: str, stage: str) -> str:
+    return f"ingestion-checkpoints/{document_id}/{stage}.json.gz"
+
+
+def save_elements_checkpoint(document_id: str, stage: str, elements):
+    """
+    Persist a stage's elements (partitioned elements or chunks) to S3, so a retried
+    ingestion task on any worker can resume after this stage instead of redoing it.
+    Checkpointing is best-effort: a failed upload only costs the resume, not the ingestion.
+    """
+    try:
+        # Chunks keep their `orig_elements` (tables, base64 images) through the JSON round trip.
+        payload = gzip.compress(elements_to_json(elements, indent=None).encode("utf-8"))
+        s3_client.put_object(
+            Bucket=appConfig["s3_bucket_name"],
+            Key=get_checkpoint_key(document_id, stage),
+            Body=payload,
+        )
+    except Exception as e:
+        print(f"Failed to save {stage} checkpoint for {document_id}: {str(e)}")
+
+
+def load_elements_checkpoint(document_id: str, stage: str):
+    """Load a stage's elements saved by save_elements_checkpoint, or None if there is none."""
+    try:
+        response = s3_client.get_object(
+            Bucket=appConfig["s3_bucket_name"],
+            Key=get_checkpoint_key(document_id, stage),
+        )
+        payload = gzip.decompress(response["Body"].read()).decode("utf-8")
+        return elements_from_json(text=payload)
+    except s3_client.exceptions.NoSuchKey:
+        return None
+    except Exception as e:
+        # A corrupt or unreadable checkpoint just means this stage runs again.
+        print(f"Ignoring unreadable {stage} checkpoint for {document_id}: {str(e)}")
+        return None
+
+
+def delete_checkpoints(document_id: str, stages):
+    try:
+        s3_client.delete_objects(
+            Bucket=appConfig["s3_bucket_name"],
+            Delete={
+                "Objects": [
+                    {"Key": get_checkpoint_key(document_id, stage)} for stage in stages
+                ]
+            },
+        )
+    except Exception as e:
+        print(f"Failed to delete checkpoints for {document_id}: {str(e)}")
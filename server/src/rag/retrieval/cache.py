@@ -0,0 +1,205 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.config.index import appConfig
+from src.services.memoryCache import TTLCache
+from src.services.redisClient import redis_client
+from src.services.queryEmbeddingCache import normalize_query
+from src.rag.retrieval.utils import (
+    get_project_settings,
+    get_project_document_ids,
+    get_project_corpus_version,
+)
+
+# project_id -> {"version", "settings", "document_ids", "corpus_version"}
+project_state_cache = TTLCache(
+    max_entries=appConfig["project_cache_max_entries"],
+    ttl_seconds=appConfig["project_cache_ttl_seconds"],
+)
+
+# retrieval_cache_key(...) -> ranked (not hydrated) final chunks: RANKED_CHUNK_FIELDS (ids and scores).
+# Degraded rankings (a failed hybrid leg or query variation generation) are never stored.
+retrieval_result_cache = TTLCache(
+    max_entries=appConfig["retrieval_cache_max_entries"],
+    ttl_seconds=appConfig["retrieval_cache_ttl_seconds"],
+)
+
+
+def project_version_key(project_id):
+    return f"project-cache-version:{project_id}"
+
+
+def get_project_version(project_id):
+    """
+    Read the project's cache version from Redis.
+    Every invalidation bumps it, so API processes and the Celery worker agree on what is stale.
+    Returns None if Redis is unavailable, in which case cached entries live until their TTL.
+    """
+    try:
+        version = redis_client.get(project_version_key(project_id))
+        return int(version) if version is not None else 0
+    except Exception as e:
+        print(f"⚠️ Project cache: Redis read failed: {str(e)}")
+        return None
+
+
+def get_cached_project_state(project_id):
+    """
+    Return (project_settings, document_ids, corpus_version) for retrieval, reading the database only when
+    the project's cache entry is missing, expired or older than the project's version.
+    """
+    version = get_project_version(project_id)
+    cached = project_state_cache.get(project_id)
+    if cached is not None and (version is None or cached["version"] == version):
+        return cached["settings"], cached["document_ids"], cached["corpus_version"]
+
+    # Read the version before the data: an invalidation racing with this load leaves an
+    # older version on the entry, so the next lookup reloads it.
+    state = {
+        "version": version,
+        "settings": get_project_settings(project_id),
+        "document_ids": get_project_document_ids(project_id),
+        "corpus_version": get_project_corpus_version(project_id),
+    }
+    project_state_cache.set(project_id, state)
+    return state["settings"], state["document_ids"], state["corpus_version"]
+
+
+def invalidate_project_cache(project_id):
+    """
+    Drop the cached settings and document ids of a project in this process and, through the
+    Redis version counter, in every other process. Called whenever project settings change or
+    a document is added, deleted or finishes ingestion. Best-effort: never raises.
+    """
+    project_state_cache.delete(project_id)
+    try:
+        redis_client.incr(project_version_key(project_id))
+    except Exception as e:
+        print(f"⚠️ Project cache: Redis invalidation failed: {str(e)}")
+
+
+def settings_fingerprint(project_settings, exclude=()):
+    """The retrieval-relevant project settings (strategy, weights, k, ...) as a stable JSON-able dict."""
+    return {
+        key: value
+        for key, value in project_settings.items()
+        if key not in ("id", "project_id", "created_at", *exclude)
+    }
+
+
+def cache_key(*parts):
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def retrieval_cache_key(project_id, corpus_version, project_settings, user_query):
+    """
+    Key for the ranked chunks of a query: the project, its corpus version, every retrieval
+    setting and the normalized query. A corpus or settings change therefore never serves
+    stale chunks, even before the old entries expire. rag_tool_mode only changes what is done
+    with the chunks, so both modes share the ranked chunks.
+    """
+    return cache_key(
+        project_id,
+        corpus_version,
+        settings_fingerprint(project_settings, exclude=("rag_tool_mode",)),
+        normalize_query(user_query),
+    )
+
+
+def semantic_answer_bucket(project_id, corpus_version, project_settings):
+    """Answers are only reused within one project, corpus version and settings."""
+    return cache_key(project_id, corpus_version, settings_fingerprint(project_settings))
+
+
+class SemanticAnswerCache:
+    """
+    In-process cache of rag_search answers, looked up by query embedding similarity.
+
+    Entries live in per-bucket (project, corpus version, settings) stores. A lookup returns the
+    answer of the most similar previous query if its cosine similarity is at least
+    `similarity_threshold`. Entries expire after `ttl_seconds`; each bucket keeps at most
+    `max_entries_per_bucket` entries and at most `max_buckets` buckets are kept (oldest first out).
+    """
+
+    def __init__(self, similarity_threshold, ttl_seconds, max_entries_per_bucket, max_buckets):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_bucket = max_entries_per_bucket
+        self.max_buckets = max_buckets
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # bucket -> list of (created_at, unit query embedding, answer, citations), oldest first
+        self.buckets = OrderedDict()
+
+    def lookup(self, bucket, query_embedding):
+        """Return {"answer", "citations", "similarity"} of the closest cached query, or None."""
+        query_vector = unit_vector(query_embedding)
+        with self.lock:
+            entries = self.prune(bucket)
+            if not entries:
+                self.misses += 1
+                return None
+
+            similarities = np.stack([entry[1] for entry in entries]) @ query_vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            _, _, answer, citations = entries[best]
+            return {
+                "answer": answer,
+                "citations": citations,
+                "similarity": float(similarities[best]),
+            }
+
+    def store(self, bucket, query_embedding, answer, citations):
+        with self.lock:
+            entries = self.prune(bucket)
+            entries.append((time.monotonic(), unit_vector(query_embedding), answer, citations))
+            del entries[: -self.max_entries_per_bucket]
+
+            self.buckets[bucket] = entries
+            self.buckets.move_to_end(bucket)
+            while len(self.buckets) > self.max_buckets:
+                self.buckets.popitem(last=False)
+
+    def prune(self, bucket):
+        """Drop the expired entries of a bucket and return the rest. Caller holds the lock."""
+        expired_before = time.monotonic() - self.ttl_seconds
+        entries = [entry for entry in self.buckets.get(bucket, []) if entry[0] > expired_before]
+        if entries:
+            self.buckets[bucket] = entries
+        else:
+            self.buckets.pop(bucket, None)
+        return entries
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+def unit_vector(embedding):
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+semantic_answer_cache = SemanticAnswerCache(
+    similarity_threshold=appConfig["semantic_answer_cache_similarity"],
+    ttl_seconds=appConfig["semantic_answer_cache_ttl_seconds"],
+    max_entries_per_bucket=appConfig["semantic_answer_cache_max_entries_per_project"],
+    max_buckets=appConfig["semantic_answer_cache_max_projects"],
+)
@@ -0,0 +1,111 @@
+import numpy as np
+
+# Below this many ranked results (summed over all lists) the plain-Python fusion is as fast or
+# faster than building arrays; see scripts/benchmark_rrf_fusion.py.
+NUMPY_FUSION_MIN_CANDIDATES = 1000
+
+
+def rrf_rank_and_fuse(search_results_list, weights=None, k=60, top_k=None):
+    """RRF (Reciprocal Rank Fusion) ranking"""
+    if sum(len(results) for results in search_results_list or []) >= NUMPY_FUSION_MIN_CANDIDATES:
+        return rrf_rank_and_fuse_numpy(search_results_list, weights, k, top_k)
+
+    fused_chunks = rrf_rank_and_fuse_python(search_results_list, weights, k)
+    return fused_chunks[:top_k] if top_k is not None else fused_chunks
+
+
+def rrf_rank_and_fuse_python(search_results_list, weights=None, k=60):
+    """RRF (Reciprocal Rank Fusion) ranking with dicts and a full sort."""
+    if not search_results_list or not any(search_results_list):
+        return []
+
+    if weights is None:
+        weights = [1.0 / len(search_results_list)] * len(search_results_list)
+
+    chunk_scores = {}
+    all_chunks = {}
+
+    for search_idx, results in enumerate(search_results_list):
+        weight = weights[search_idx]
+
+        for rank, chunk in enumerate(results):
+            chunk_id = chunk.get("id")
+            if not chunk_id:
+                continue
+
+            rrf_score = weight * (1.0 / (k + rank + 1))
+
+            if chunk_id in chunk_scores:
+                chunk_scores[chunk_id] += rrf_score
+            else:
+                chunk_scores[chunk_id] = rrf_score
+                all_chunks[chunk_id] = chunk
+
+    sorted_chunk_ids = sorted(
+        chunk_scores.keys(), key=lambda cid: chunk_scores[cid], reverse=True
+    )
+    return [all_chunks[chunk_id] for chunk_id in sorted_chunk_ids]
+
+
+def rrf_rank_and_fuse_numpy(search_results_list, weights=None, k=60, top_k=None):
+    """
+    RRF ranking with array-based score accumulation and argpartition top-k selection.
+
+    Same scores, order and tie-breaking as rrf_rank_and_fuse_python: chunks are numbered in
+    order of first appearance, contributions are summed in the same order, and equal scores
+    keep first-appearance order. With `top_k`, only the best `top_k` chunks are fully sorted.
+    """
+    if not search_results_list or not any(search_results_list):
+        return []
+
+    if weights is None:
+        weights = [1.0 / len(search_results_list)] * len(search_results_list)
+
+    # Number chunks in order of first appearance. Missing ids are numbered too and dropped below.
+    chunk_index_by_id = {}
+    number_chunk = chunk_index_by_id.setdefault
+    all_chunks = []
+    chunk_indexes = []
+    contributions = []
+    for weight, results in zip(weights, search_results_list):
+        if not results:
+            continue
+        all_chunks.extend(results)
+        chunk_indexes.extend(
+            [number_chunk(chunk.get("id"), len(chunk_index_by_id)) for chunk in results]
+        )
+        contributions.append(weight * (1.0 / (k + np.arange(len(results)) + 1)))
+
+    chunk_indexes = np.array(chunk_indexes, dtype=np.int64)
+    # np.add.at accumulates repeated indexes in order, like the += of the dict version.
+    scores = np.zeros(len(chunk_index_by_id), dtype=np.float64)
+    np.add.at(scores, chunk_indexes, np.concatenate(contributions))
+
+    # Numbers are handed out in increasing order, so a chunk's first position is where the
+    # running maximum of the numbers grows.
+    first_positions = np.flatnonzero(
+        np.diff(np.maximum.accumulate(chunk_indexes), prepend=-1) > 0
+    )
+    unique_chunks = [all_chunks[position] for position in first_positions]
+
+    # Chunks without an id never make it into the result.
+    missing_ids = [index for chunk_id, index in chunk_index_by_id.items() if not chunk_id]
+    scores[missing_ids] = -np.inf
+    limit = len(scores) - len(missing_ids)
+    if top_k is not None:
+        limit = min(limit, top_k)
+    if limit <= 0:
+        return []
+
+    candidates = np.arange(len(scores))
+    if limit < len(scores):
+        # Everything scoring above the limit-th best score, plus as many of the chunks tied
+        # with it as still fit, in first-appearance order.
+        kth_score = scores[np.argpartition(-scores, limit - 1)[limit - 1]]
+        above = candidates[scores > kth_score]
+        tied = candidates[scores == kth_score][: limit - len(above)]
+        candidates = np.concatenate([above, tied])
+
+    # Sort by score descending, then by first appearance.
+    order = candidates[np.lexsort((candidates, -scores[candidates]))]
+    return [unique_chunks[index] for index in order]
@@ -1,81 +1,296 @@
-from src.services.llm import openAI
 from fastapi import HTTPException
+from postgrest.exceptions import APIError
 from src.services.supabase import supabase
+from src.services.queryEmbeddingCache import query_embedding_cache
+from src.rag.retrieval.cache import (
+    get_cached_project_state,
+    retrieval_cache_key,
+    retrieval_result_cache,
+    semantic_answer_bucket,
+    semantic_answer_cache,
+)
 from src.rag.retrieval.utils import (
-    get_project_settings,
-    get_project_document_ids,
     build_context_from_retrieved_chunks,
+    build_compact_context_from_retrieved_chunks,
+    prepare_prompt_and_invoke_llm,
     generate_query_variations,
+    hydrate_chunks,
+)
+from src.rag.retrieval.reranking import rerank_chunks
+from src.services.llm import openAI
+import json
+import threading
+from functools import partial
+import time
+from typing import List, Dict, Tuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from src.config.index import appConfig
+from src.rag.retrieval.utils import validate_context_from_retrieved_chunks
+from src.rag.retrieval.fusion import rrf_rank_and_fuse
+
+# Shared pool for fanning out the per-query searches of the multi-query strategies.
+query_search_executor = ThreadPoolExecutor(
+    max_workers=appConfig["retrieval_max_workers"], thread_name_prefix="query-search"
+)
+# Separate pool for the vector/keyword legs of hybrid_search. hybrid_search itself runs on
+# query_search_executor during multi-query fan-out, so sharing one pool could deadlock.
+hybrid_leg_executor = ThreadPoolExecutor(
+    max_workers=appConfig["retrieval_max_workers"] * 2, thread_name_prefix="hybrid-leg"
 )
-from typing import List, Dict
-from src.rag.retrieval.utils import rrf_rank_and_fuse, validate_context_from_retrieved_chunks
 
 
-def retrieve_context(project_id, user_query):
+RAG_TOOL_MODE_ANSWER = "answer"
+RAG_TOOL_MODE_CONTEXT = "context"
+
+
+def answer_with_rag(project_id, user_query):
+    """
+    Answer a query from the project's documents, as done by the agents' rag_search tools.
+    Returns (answer, citations, metrics); answer is None when no relevant context was found.
+
+    The project's rag_tool_mode decides what "answer" is:
+    * "answer": a written answer from a separate LLM call over the full multi-modal context.
+    * "context": the compact, citation-tagged retrieved context itself, so the agent model
+      writes the only answer and the nested generation is skipped.
+
+    A semantically equivalent query answered earlier for the same corpus version and settings
+    is served from the semantic answer cache, without retrieval or an LLM call. Answers built
+    from degraded retrieval or without any text context are not cached.
+
+    metrics make the two modes comparable: mode, cache_hit, retrieval_ms, generation_ms,
+    total_ms, the nested LLM call's input/output tokens (0 in context mode) and
+    result_tokens, the tokens returned to the agent model. search_legs has the status and
+    latency of every hybrid search leg that ran (empty for other strategies and cache hits).
+    """
+    started_at = time.perf_counter()
+    project_settings, _, corpus_version = get_cached_project_state(project_id)
+    rag_tool_mode = project_settings.get("rag_tool_mode") or RAG_TOOL_MODE_ANSWER
+    metrics = {
+        "mode": rag_tool_mode,
+        "cache_hit": False,
+        "retrieval_ms": 0,
+        "generation_ms": 0,
+        "total_ms": 0,
+        "llm_input_tokens": 0,
+        "llm_output_tokens": 0,
+        "result_tokens": 0,
+        "search_legs": [],
+    }
+    bucket = semantic_answer_bucket(project_id, corpus_version, project_settings)
+    query_embedding = query_embedding_cache.embed_query(user_query)
+
+    cached_answer = semantic_answer_cache.lookup(bucket, query_embedding)
+    if cached_answer is not None:
+        print(
+            f"Semantic answer cache hit (similarity {cached_answer['similarity']:.3f}): {semantic_answer_cache.stats()}"
+        )
+        answer = cached_answer["answer"]
+        metrics["cache_hit"] = True
+        return answer, cached_answer["citations"], record_rag_metrics(metrics, started_at, answer)
+
+    if rag_tool_mode == RAG_TOOL_MODE_CONTEXT:
+        answer, citations, degraded = retrieve_compact_context(
+            project_id, user_query, metrics["search_legs"]
+        )
+        metrics["retrieval_ms"] = elapsed_ms(started_at)
+        if not answer:
+            return None, [], record_rag_metrics(metrics, started_at, None)
+        cacheable = not degraded
+    else:
+        texts, images, tables, citations, degraded = retrieve_context(
+            project_id, user_query, metrics["search_legs"]
+        )
+        metrics["retrieval_ms"] = elapsed_ms(started_at)
+        if not texts and not images and not tables:
+            return None, [], record_rag_metrics(metrics, started_at, None)
+
+        answer, usage = prepare_prompt_and_invoke_llm(
+            user_query=user_query, texts=texts, images=images, tables=tables
+        )
+        metrics["generation_ms"] = elapsed_ms(started_at) - metrics["retrieval_ms"]
+        metrics["llm_input_tokens"] = usage["input_tokens"]
+        metrics["llm_output_tokens"] = usage["output_tokens"]
+        cacheable = not degraded and bool(texts)
+
+    record_rag_metrics(metrics, started_at, answer)
+    if cacheable:
+        semantic_answer_cache.store(bucket, query_embedding, answer, citations)
+    else:
+        print("⚠️ Degraded retrieval or no text context, not caching the answer")
+    return answer, citations, metrics
+
+
+def elapsed_ms(started_at):
+    return round((time.perf_counter() - started_at) * 1000)
+
+
+def record_rag_metrics(metrics, started_at, answer):
+    """Complete metrics with the total latency and result size, log them and return them."""
+    metrics["total_ms"] = elapsed_ms(started_at)
+    metrics["result_tokens"] = openAI["chat_llm"].get_num_tokens(answer) if answer else 0
+    print(f"rag_search metrics: {json.dumps(metrics)}")
+    return metrics
+
+
+def rank_project_chunks(project_id, user_query, search_legs=None):
+    """
+    Steps 1 - 8 of retrieval: returns (chunks, degraded), the ranked (not hydrated) final
+    chunks for a query and whether a weaker fallback ranking was used (see search_by_strategy).
+    Ranked chunks are cached per (project, corpus version, settings, query), unless degraded.
+    The hybrid search legs that ran are appended to `search_legs` (see collect_search_leg).
+    """
+    # Step 1 & 2: Get user's project settings and the document IDs for the current project.
+    project_settings, document_ids, corpus_version = get_cached_project_state(
+        project_id
+    )
+    # print("Found document IDs: ", len(document_ids))
+
+    # Step 3 - 8: Rank the chunks with the selected strategy, unless this exact query was
+    # already answered for the same corpus version and settings.
+    cache_key = retrieval_cache_key(
+        project_id, corpus_version, project_settings, user_query
+    )
+    chunks = retrieval_result_cache.get(cache_key)
+    degraded = False
+    if chunks is None:
+        chunks, degraded = search_by_strategy(
+            user_query, document_ids, project_settings, search_legs
+        )
+        if degraded:
+            # A timed-out/failed search leg or failed query variation generation is transient;
+            # caching it would serve the weaker ranking for the whole cache TTL.
+            print("⚠️ Degraded retrieval, not caching the ranked chunks")
+        else:
+            retrieval_result_cache.set(cache_key, chunks)
+    else:
+        print(f"Retrieval cache hit: {len(chunks)} chunks")
+
+    print(f"Query embedding cache: {query_embedding_cache.stats()}")
+    print(f"Retrieval cache: {retrieval_result_cache.stats()}")
+    return chunks, degraded
+
+
+def retrieve_compact_context(project_id, user_query, search_legs=None):
+    """
+    Retrieval for the "context" rag_tool_mode: returns (context, citations, degraded), where
+    context is the searchable text of each final chunk tagged with its citation number.
+    """
+    try:
+        chunks, degraded = rank_project_chunks(project_id, user_query, search_legs)
+        chunks = hydrate_chunks(chunks, columns="id, document_id, page_number, content")
+        context, citations = build_compact_context_from_retrieved_chunks(
+            chunks, max_chars_per_chunk=appConfig["rag_context_max_chars_per_chunk"]
+        )
+        return context, citations, degraded
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Failed in RAG's Retrieval: {str(e)}"
+        )
+
+
+def retrieve_context(project_id, user_query, search_legs=None):
     try:
         """
         RAG Retrieval Pipeline Steps:
-        * Step 1: Get user's project settings from the database.
-        * Step 2: Retrieve the document IDs for the current project.
+        * Step 1 & 2: Get user's project settings and the completed document IDs (cached per project).
         * Step 3: Perform a vector search using the RPC function to find the most relevant chunks.
         * Step 4: Perform a hybrid search (combines vector + keyword search) using RPC function.
         * Step 5: Perform multi-query vector search (generate multiple query variations and search)
         * Step 6: Perform multi-query hybrid search (multiple queries with hybrid strategy)
-        * Step 7: Build the context from the retrieved chunks and format them into a structured context with citations.
+        * Steps 3 - 6 are skipped when the ranked chunks are cached for this (project, corpus version, settings, query).
+        * Step 7: Hydrate the surviving top k chunks with their original_content (searches only rank ids and scores).
+        * Step 8: Build the context from the retrieved chunks and format them into a structured context with citations.
+        Returns (texts, images, tables, citations, degraded); degraded as in rank_project_chunks.
         """
-        # Step 1: Get user's project settings from the database.
-        project_settings = get_project_settings(project_id)
-
-        # Step 2: Retrieve the document IDs for the current project.
-        document_ids = get_project_document_ids(project_id)
-        # print("Found document IDs: ", len(document_ids))
-
-        # Step 4 & 5: Execute search based on selected strategy.
-        strategy = project_settings["rag_strategy"]
-        chunks = []
-        if strategy == "basic":
-            # Basic RAG Strategy: Vector search only
-            chunks = vector_search(user_query, document_ids, project_settings)
-            print(f"Vector search resulted in: {len(chunks)} chunks")
-
-        elif strategy == "hybrid":
-            # Hybrid RAG Strategy: Combines vector + keyword search with RRF ranking
-            chunks = hybrid_search(user_query, document_ids, project_settings)
-            print(f"Hybrid search resulted in: {len(chunks)} chunks")
-
-        # Step 6: Multi-query vector search
-        elif strategy == "multi-query-vector":
-            chunks = multi_query_vector_search(
-                user_query, document_ids, project_settings
-            )
-            print(f"Multi-query vector search resulted in: {len(chunks)} chunks")
-
-        # Step 7: Multi-query hybrid search
-        elif strategy == "multi-query-hybrid":
-            chunks = multi_query_hybrid_search(
-                user_query, document_ids, project_settings
-            )
-            print(f"Multi-query hybrid search resulted in: {len(chunks)} chunks")
-
-        # Step 8: Selecting top k chunks
-        chunks = chunks[: project_settings["final_context_size"]]
-
-        # Step 9: Build the context from the retrieved chunks and format them into a structured context with citations.
+        # Step 1 - 8: Rank the chunks (see rank_project_chunks)
+        chunks, degraded = rank_project_chunks(project_id, user_query, search_legs)
+
+        # Step 9: Fetch the chunk payloads for only the final context
+        chunks = hydrate_chunks(chunks)
+
+        # Step 10: Build the context from the retrieved chunks and format them into a structured context with citations.
         texts, images, tables, citations = build_context_from_retrieved_chunks(chunks)
         print(f"context build results = texts:{len(texts)}, images:{len(images)}, tables:{len(tables)}, citations:{len(citations)}")
         validate_context_from_retrieved_chunks(texts, images, tables, citations)
 
-        return texts, images, tables, citations
+        return texts, images, tables, citations, degraded
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Failed in RAG's Retrieval: {str(e)}"
         )
 
 
-def vector_search(user_query, document_ids, project_settings):
-    user_query_embedding = openAI["embeddings"].embed_documents([user_query])[0]
+# The fields of a ranked chunk; payloads (content, original_content) are hydrated on demand.
+RANKED_CHUNK_FIELDS = ("id", "document_id", "page_number", "score", "rerank_score")
+
+
+def search_by_strategy(user_query, document_ids, project_settings, search_legs=None):
+    """
+    Rank chunks with the project's RAG strategy, optionally rerank them and keep the top final_context_size.
+    Returns (chunks, degraded): chunks carry only RANKED_CHUNK_FIELDS, and degraded is True when a
+    hybrid search leg or the query variation generation failed and a weaker ranking was used.
+    """
+    # Step 4 & 5: Execute search based on selected strategy.
+    strategy = project_settings["rag_strategy"]
+    chunks = []
+    degraded = False
+    if strategy == "basic":
+        # Basic RAG Strategy: Vector search only
+        chunks = vector_search(user_query, document_ids, project_settings)
+        print(f"Vector search resulted in: {len(chunks)} chunks")
+
+    elif strategy == "hybrid":
+        # Hybrid RAG Strategy: Combines vector + keyword search with RRF ranking
+        chunks, degraded = hybrid_search(
+            user_query, document_ids, project_settings, search_legs=search_legs
+        )
+        print(f"Hybrid search resulted in: {len(chunks)} chunks")
+
+    elif strategy == "hybrid-server":
+        # Hybrid RAG Strategy with vector + keyword search and RRF fused inside Postgres
+        chunks, degraded = server_hybrid_search(
+            user_query, document_ids, project_settings, search_legs
+        )
+        print(f"Server hybrid search resulted in: {len(chunks)} chunks")
+
+    # Step 6: Multi-query vector search
+    elif strategy == "multi-query-vector":
+        chunks, degraded = multi_query_vector_search(
+            user_query, document_ids, project_settings
+        )
+        print(f"Multi-query vector search resulted in: {len(chunks)} chunks")
+
+    # Step 7: Multi-query hybrid search
+    elif strategy == "multi-query-hybrid":
+        chunks, degraded = multi_query_hybrid_search(
+            user_query, document_ids, project_settings, search_legs
+        )
+        print(f"Multi-query hybrid search resulted in: {len(chunks)} chunks")
+
+    # Step 8: Rerank the fused candidates on their text, then select top k chunks
+    if project_settings["reranking_enabled"] and len(chunks) > 1:
+        chunks = rerank_chunks(
+            user_query,
+            hydrate_chunks(chunks, columns="id, content"),
+            project_settings["reranking_model"],
+        )
+
+    chunks = [
+        {field: chunk[field] for field in RANKED_CHUNK_FIELDS if field in chunk}
+        for chunk in chunks[: project_settings["final_context_size"]]
+    ]
+    return chunks, degraded
+
+
+def vector_search(user_query, document_ids, project_settings, query_embedding=None):
+    # Multi-query strategies embed all their variations in one batched call and pass them in.
+    user_query_embedding = (
+        query_embedding
+        if query_embedding is not None
+        else query_embedding_cache.embed_query(user_query)
+    )
     vector_search_result_chunks = supabase.rpc(
-        "vector_search_document_chunks",
+        "vector_search_document_chunk_ids",
         {
             "query_embedding": user_query_embedding,
             "filter_document_ids": document_ids,
@@ -88,7 +303,7 @@ def vector_search(user_query, document_ids, project_settings):
 
 def keyword_search(query, document_ids, settings):
     keyword_search_result_chunks = supabase.rpc(
-        "keyword_search_document_chunks",
+        "keyword_search_document_chunk_ids",
         {
             "query_text": query,
             "filter_document_ids": document_ids,
@@ -101,22 +316,140 @@ def keyword_search(query, document_ids, settings):
     )
 
 
-def hybrid_search(query: str, document_ids: List[str], settings: dict) -> List[Dict]:
-    """Execute hybrid search by combining vector and keyword results"""
-    # Get results from both search methods
-    vector_results = vector_search(query, document_ids, settings)
-    keyword_results = keyword_search(query, document_ids, settings)
+def hybrid_search(
+    query: str,
+    document_ids: List[str],
+    settings: dict,
+    query_embedding=None,
+    search_legs: List[Dict] = None,
+) -> Tuple[List[Dict], bool]:
+    """
+    Execute hybrid search by combining vector and keyword results.
+    Returns (chunks, degraded); degraded is True when only one leg's results could be used.
+    The status and latency of both legs are appended to `search_legs` when given.
+    """
+    # Run both search methods concurrently; each leg has its own timeout
+    vector_leg = submit_search_leg(
+        vector_search, query, document_ids, settings, query_embedding
+    )
+    keyword_leg = submit_search_leg(keyword_search, query, document_ids, settings)
+
+    vector_results, vector_report = collect_search_leg(
+        "vector", vector_leg, appConfig["hybrid_vector_timeout_seconds"]
+    )
+    keyword_results, keyword_report = collect_search_leg(
+        "keyword", keyword_leg, appConfig["hybrid_keyword_timeout_seconds"]
+    )
+    if search_legs is not None:
+        search_legs.extend([vector_report, keyword_report])
 
-    print(f"📈 Vector search returned: {len(vector_results)} chunks")
-    print(f"📈 Keyword search returned: {len(keyword_results)} chunks")
+    # Degraded mode: fall back to whichever leg finished
+    if vector_results is None and keyword_results is None:
+        raise Exception("Failed to run hybrid search: both vector and keyword searches failed")
+    if keyword_results is None:
+        print("⚠️ Hybrid search degraded to vector results only")
+        return vector_results, True
+    if vector_results is None:
+        print("⚠️ Hybrid search degraded to keyword results only")
+        return keyword_results, True
 
     # Combine using RRF with configured weights
-    return rrf_rank_and_fuse(
-        [vector_results, keyword_results],
-        [settings["vector_weight"], settings["keyword_weight"]],
+    return (
+        rrf_rank_and_fuse(
+            [vector_results, keyword_results],
+            [settings["vector_weight"], settings["keyword_weight"]],
+        ),
+        False,
     )
 
 
+def submit_search_leg(search, *args):
+    """
+    Run one hybrid search leg on hybrid_leg_executor.
+    Returns (future, started); `started` records when the leg actually began running.
+    """
+    started = {"event": threading.Event(), "at": None}
+    future = hybrid_leg_executor.submit(timed_search_leg, started, search, *args)
+    return future, started
+
+
+def timed_search_leg(started, search, *args):
+    """Run one hybrid search leg and return (results, duration_seconds)."""
+    started["at"] = time.monotonic()
+    started["event"].set()
+    results = search(*args)
+    return results, time.monotonic() - started["at"]
+
+
+def collect_search_leg(name, leg, timeout_seconds):
+    """
+    Wait for a hybrid search leg until `timeout_seconds` after it started running.
+    Time spent queued behind other legs in the shared pool does not count, so a busy pool
+    does not time out legs against a healthy database. Waiting for the leg to start is bounded
+    by `timeout_seconds` too; a leg still queued by then is cancelled and counts as timed out.
+
+    Returns (chunks, report): chunks is None if the leg timed out or failed so the caller can
+    fall back to the other leg, and report is {"leg", "status", "ms"} with status "ok",
+    "timeout", "not_started" or "failed" and ms how long the leg ran (None unless ok or timeout).
+    A timed-out leg is left to finish in the background; its result is dropped.
+    """
+    future, started = leg
+    if not started["event"].wait(timeout_seconds):
+        future.cancel()
+        print(f"⏱️ {name.capitalize()} search did not start within {timeout_seconds}s")
+        return None, {"leg": name, "status": "not_started", "ms": None}
+
+    remaining = max(0.0, timeout_seconds - (time.monotonic() - started["at"]))
+    try:
+        results, duration = future.result(timeout=remaining)
+    except FutureTimeoutError:
+        print(f"⏱️ {name.capitalize()} search timed out after {timeout_seconds}s")
+        return None, {"leg": name, "status": "timeout", "ms": round(timeout_seconds * 1000)}
+    except Exception as e:
+        print(f"❌ {name.capitalize()} search failed: {str(e)}")
+        return None, {"leg": name, "status": "failed", "ms": None}
+
+    print(f"📈 {name.capitalize()} search returned: {len(results)} chunks in {duration:.3f}s")
+    return results, {"leg": name, "status": "ok", "ms": round(duration * 1000)}
+
+
+def server_hybrid_search(
+    query: str, document_ids: List[str], settings: dict, search_legs: List[Dict] = None
+) -> Tuple[List[Dict], bool]:
+    """
+    Execute hybrid search in one RPC: Postgres runs both legs and the weighted RRF fusion and
+    returns only the ids and scores of the final top-k (or, with reranking, of all fused candidates).
+    Falls back to hybrid_search (RRF fusion in Python) if the function is not deployed.
+    Returns (chunks, degraded) like hybrid_search.
+    """
+    query_embedding = query_embedding_cache.embed_query(query)
+    try:
+        fused_result = supabase.rpc(
+            "hybrid_search_document_chunks",
+            {
+                "query_text": query,
+                "query_embedding": query_embedding,
+                "filter_document_ids": document_ids,
+                "vector_weight": settings["vector_weight"],
+                "keyword_weight": settings["keyword_weight"],
+                "chunks_per_search": settings["chunks_per_search"],
+                # With reranking, return every fused candidate (at most one list per leg) so the
+                # reranker can promote chunks from below the final top k.
+                "final_context_size": fusion_top_k(settings)
+                or 2 * settings["chunks_per_search"],
+                "match_threshold": settings["similarity_threshold"],
+            },
+        ).execute()
+    except APIError as e:
+        # PGRST202: the function was not found in the schema cache
+        if e.code != "PGRST202":
+            raise
+        print("⚠️ hybrid_search_document_chunks is missing, falling back to hybrid_search")
+        return hybrid_search(query, document_ids, settings, query_embedding, search_legs)
+
+    return fused_result.data or [], False
+
+
 def multi_query_vector_search(user_query, document_ids, project_settings):
     """Execute multi-query vector search using query variations"""
     queries = generate_query_variations(
@@ -124,34 +457,73 @@ def multi_query_vector_search(user_query, document_ids, project_settings):
     )
     print(f"Generated {len(queries)} query variations")
 
-    all_chunks = []
-    for index, query in enumerate(queries):
-        chunks = vector_search(query, document_ids, project_settings)
-        all_chunks.append(chunks)
+    all_chunks = search_query_variations(
+        vector_search, queries, document_ids, project_settings
+    )
+    for index, (query, chunks) in enumerate(zip(queries, all_chunks)):
         print(
             f"Vector search for query {index+1}/{len(queries)}: {query} resulted in: {len(chunks)} chunks"
         )
 
-    final_chunks = rrf_rank_and_fuse(all_chunks)
+    final_chunks = rrf_rank_and_fuse(all_chunks, top_k=fusion_top_k(project_settings))
     print(f"RRF Fusion returned {len(final_chunks)} chunks")
-    return final_chunks
+    return final_chunks, query_variations_failed(queries, project_settings)
 
 
-def multi_query_hybrid_search(user_query, document_ids, project_settings):
+def multi_query_hybrid_search(user_query, document_ids, project_settings, search_legs=None):
     """Execute multi-query hybrid search using query variations"""
     queries = generate_query_variations(
         user_query, project_settings["number_of_queries"]
     )
     print(f"Generated {len(queries)} query variations for hybrid search")
 
-    all_chunks = []
-    for index, query in enumerate(queries):
-        chunks = hybrid_search(query, document_ids, project_settings)
-        all_chunks.append(chunks)
+    hybrid_results = search_query_variations(
+        partial(hybrid_search, search_legs=search_legs),
+        queries,
+        document_ids,
+        project_settings,
+    )
+    all_chunks = [chunks for chunks, _ in hybrid_results]
+    degraded = query_variations_failed(queries, project_settings) or any(
+        leg_degraded for _, leg_degraded in hybrid_results
+    )
+    for index, (query, chunks) in enumerate(zip(queries, all_chunks)):
         print(
             f"Hybrid search for query {index+1}/{len(queries)}: {query} resulted in: {len(chunks)} chunks"
         )
 
-    final_chunks = rrf_rank_and_fuse(all_chunks)
+    final_chunks = rrf_rank_and_fuse(all_chunks, top_k=fusion_top_k(project_settings))
     print(f"RRF Fusion returned {len(final_chunks)} chunks")
-    return final_chunks
+    return final_chunks, degraded
+
+
+def query_variations_failed(queries, project_settings):
+    """generate_query_variations falls back to just the original query when the LLM call fails."""
+    return project_settings["number_of_queries"] > 1 and len(queries) == 1
+
+
+def search_query_variations(search, queries, document_ids, project_settings):
+    """
+    Run `search` (vector_search or hybrid_search) for every query variation concurrently.
+
+    Variations missing from the query embedding cache are embedded in one batched call, then the searches are
+    dispatched to the thread pool, so the whole fan-out costs roughly one search round trip
+    instead of N. Results keep the order of `queries`.
+    """
+    query_embeddings = query_embedding_cache.embed_queries(queries)
+
+    futures = [
+        query_search_executor.submit(
+            search, query, document_ids, project_settings, query_embedding
+        )
+        for query, query_embedding in zip(queries, query_embeddings)
+    ]
+
+    return [future.result() for future in futures]
+
+
+def fusion_top_k(project_settings):
+    """How many fused chunks the final fusion must return: all candidates if they are reranked."""
+    if project_settings["reranking_enabled"]:
+        return None
+    return project_settings["final_context_size"]
@@ -0,0 +1,180 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter
+from typing import List, Dict
+
+from src.config.index import appConfig
+from src.services.memoryCache import TTLCache
+from src.services.queryEmbeddingCache import normalize_query
+
+LEXICAL_RERANKER = "lexical-bm25"
+DEFAULT_CROSS_ENCODER = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+# Former reranking_model values that are not cross-encoders -> the reranker now used for them
+# (rewritten by the 20261017140000 migration; kept for settings saved before it ran).
+LEGACY_RERANKERS = {"reranker-english-v3.0": LEXICAL_RERANKER}
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def min_max_normalize(scores: List[float]) -> List[float]:
+    low, high = min(scores), max(scores)
+    if high == low:
+        return [1.0] * len(scores)
+    return [(score - low) / (high - low) for score in scores]
+
+
+class LexicalReranker:
+    """
+    Offline, dependency-free reranker: BM25 over the candidate set, blended with the candidate's
+    position in the fused ranking. Fusion already captures semantic similarity, so the blend
+    promotes candidates that also share the query's exact terms.
+    """
+
+    name = LEXICAL_RERANKER
+
+    def __init__(self, lexical_weight: float, k1: float = 1.5, b: float = 0.75):
+        self.lexical_weight = lexical_weight
+        self.k1 = k1
+        self.b = b
+
+    def score(self, query: str, contents: List[str]) -> List[float]:
+        query_terms = set(tokenize(query))
+        documents = [Counter(tokenize(content)) for content in contents]
+        total = len(documents)
+        average_length = sum(sum(doc.values()) for doc in documents) / total or 1.0
+
+        bm25_scores = []
+        for doc in documents:
+            length = sum(doc.values())
+            score = 0.0
+            for term in query_terms:
+                frequency = doc.get(term, 0)
+                if not frequency:
+                    continue
+                document_frequency = sum(1 for other in documents if term in other)
+                idf = math.log(
+                    1 + (total - document_frequency + 0.5) / (document_frequency + 0.5)
+                )
+                score += idf * (
+                    frequency
+                    * (self.k1 + 1)
+                    / (frequency + self.k1 * (1 - self.b + self.b * length / average_length))
+                )
+            bm25_scores.append(score)
+
+        # Position in the fused ranking, 1.0 for the first candidate down to 0.0 for the last.
+        fusion_scores = [
+            1.0 - rank / (total - 1) if total > 1 else 1.0 for rank in range(total)
+        ]
+        return [
+            self.lexical_weight * lexical + (1 - self.lexical_weight) * fusion
+            for lexical, fusion in zip(min_max_normalize(bm25_scores), fusion_scores)
+        ]
+
+
+class CrossEncoderReranker:
+    """
+    Local cross-encoder (sentence-transformers) scoring (query, chunk) pairs on CPU in batches.
+    Scores are cached per (model, normalized query, chunk id), so re-asked questions and
+    overlapping candidate sets are only scored once.
+    """
+
+    def __init__(self, model_name: str, batch_size: int, score_cache: TTLCache):
+        # Optional dependency: raises ImportError when sentence-transformers is not installed.
+        from sentence_transformers import CrossEncoder
+
+        self.name = model_name
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+        self.score_cache = score_cache
+
+    def cache_key(self, query: str, chunk_id: str) -> str:
+        return hashlib.sha256(
+            f"{self.name}:{normalize_query(query)}:{chunk_id}".encode("utf-8")
+        ).hexdigest()
+
+    def score_chunks(self, query: str, chunks: List[Dict]) -> List[float]:
+        keys = [self.cache_key(query, chunk["id"]) for chunk in chunks]
+        scores = self.score_cache.get_many(keys)
+
+        missing = [
+            (key, chunk["content"])
+            for key, chunk in zip(keys, chunks)
+            if key not in scores
+        ]
+        if missing:
+            new_scores = self.model.predict(
+                [(query, content) for _, content in missing],
+                batch_size=self.batch_size,
+                show_progress_bar=False,
+            )
+            new_scores = {key: float(score) for (key, _), score in zip(missing, new_scores)}
+            scores.update(new_scores)
+            self.score_cache.set_many(new_scores)
+
+        return [scores[key] for key in keys]
+
+
+cross_encoder_score_cache = TTLCache(
+    max_entries=appConfig["reranking_score_cache_max_entries"],
+    ttl_seconds=appConfig["reranking_score_cache_ttl_seconds"],
+)
+lexical_reranker = LexicalReranker(lexical_weight=appConfig["reranking_lexical_weight"])
+
+# reranking_model -> loaded reranker. Cross-encoders are loaded once per process, on first use.
+loaded_rerankers = {LEXICAL_RERANKER: lexical_reranker}
+loaded_rerankers_lock = threading.Lock()
+
+
+def get_reranker(model_name: str):
+    """
+    Return the reranker for a project's reranking_model setting.
+    Names other than "lexical-bm25" are loaded as sentence-transformers cross-encoders; if that
+    is not possible (package not installed, unknown model, no network for the first download),
+    the lexical reranker is used instead.
+    """
+    if model_name in LEGACY_RERANKERS:
+        print(
+            f"⚠️ Reranker {model_name} is no longer supported, using {LEGACY_RERANKERS[model_name]}"
+        )
+        model_name = LEGACY_RERANKERS[model_name]
+
+    with loaded_rerankers_lock:
+        if model_name not in loaded_rerankers:
+            try:
+                loaded_rerankers[model_name] = CrossEncoderReranker(
+                    model_name,
+                    batch_size=appConfig["reranking_batch_size"],
+                    score_cache=cross_encoder_score_cache,
+                )
+            except Exception as e:
+                print(
+                    f"⚠️ Reranker {model_name} unavailable, using {LEXICAL_RERANKER}: {str(e)}"
+                )
+                loaded_rerankers[model_name] = lexical_reranker
+        return loaded_rerankers[model_name]
+
+
+def rerank_chunks(query: str, chunks: List[Dict], model_name: str) -> List[Dict]:
+    """
+    Reorder fused candidates (which must carry `id` and `content`) by reranker score.
+    Ties keep the fused order.
+    """
+    if len(chunks) < 2:
+        return chunks
+
+    reranker = get_reranker(model_name)
+    if isinstance(reranker, CrossEncoderReranker):
+        scores = reranker.score_chunks(query, chunks)
+    else:
+        scores = reranker.score(query, [chunk["content"] for chunk in chunks])
+
+    order = sorted(range(len(chunks)), key=lambda index: -scores[index])
+    print(f"Reranked {len(chunks)} chunks with {reranker.name}")
+    return [{**chunks[index], "rerank_score": scores[index]} for index in order]
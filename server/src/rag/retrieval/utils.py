@@ -3,7 +3,7 @@ from fastapi import HTTPException
 from typing import List, Dict, Tuple
 from langchain_core.messages import SystemMessage, HumanMessage
 from src.services.llm import openAI
-from src.models.index import QueryVariations
+from src.models.index import QueryVariations, ProcessingStatus
 
 
 def get_project_settings(project_id):
@@ -30,6 +30,8 @@ def get_project_document_ids(project_id):
             supabase.table("project_documents")
             .select("id")
             .eq("project_id", project_id)
+            # Documents still being ingested have no (or partial) chunks to search.
+            .eq("processing_status", ProcessingStatus.COMPLETED.value)
             .execute()
         )
 
@@ -42,6 +44,71 @@ def get_project_document_ids(project_id):
         raise Exception(f"Failed to get document IDs: {str(e)}")
 
 
+def get_project_corpus_version(project_id):
+    """Version of the project's searchable documents; bumped by a database trigger on every document change."""
+    try:
+        project_result = (
+            supabase.table("projects")
+            .select("corpus_version")
+            .eq("id", project_id)
+            .execute()
+        )
+
+        if not project_result.data:
+            raise HTTPException(status_code=404, detail="Project not found")
+
+        return project_result.data[0]["corpus_version"]
+    except Exception as e:
+        raise Exception(f"Failed to get project corpus version: {str(e)}")
+
+
+def hydrate_chunks(
+    chunks: List[Dict], columns: str = "id, document_id, page_number, original_content"
+) -> List[Dict]:
+    """
+    Fetch the chunk payloads (by default document_id, page_number, original_content) for ranked chunks in ONE query.
+    Ranking only needs ids and scores, so the heavy original_content JSON is loaded just for the final context.
+    The ranked order is preserved; chunks deleted since ranking are dropped.
+    """
+    if not chunks:
+        return []
+
+    try:
+        chunk_ids = [chunk["id"] for chunk in chunks]
+        result = (
+            supabase.table("document_chunks")
+            .select(columns)
+            .in_("id", chunk_ids)
+            .execute()
+        )
+        rows_by_id = {row["id"]: row for row in result.data or []}
+
+        return [
+            {**chunk, **rows_by_id[chunk["id"]]}
+            for chunk in chunks
+            if chunk["id"] in rows_by_id
+        ]
+    except Exception as e:
+        raise Exception(f"Failed to hydrate chunks: {str(e)}")
+
+
+def get_document_filenames(chunks: List[Dict]) -> Dict[str, str]:
+    """Fetch the filenames of the documents the chunks belong to in ONE query, as {document_id: filename}."""
+    unique_doc_ids = list(
+        {chunk["document_id"] for chunk in chunks if chunk.get("document_id")}
+    )
+    if not unique_doc_ids:
+        return {}
+
+    result = (
+        supabase.table("project_documents")
+        .select("id, filename")
+        .in_("id", unique_doc_ids)
+        .execute()
+    )
+    return {doc["id"]: doc["filename"] for doc in result.data}
+
+
 def build_context_from_retrieved_chunks(
     chunks: List[Dict],
 ) -> Tuple[List[str], List[str], List[str], List[Dict]]:
@@ -58,22 +125,7 @@ def build_context_from_retrieved_chunks(
     citations = []
 
     # Batch fetch all filenames of chunks in ONE query
-    doc_ids = [chunk["document_id"] for chunk in chunks if chunk.get("document_id")]
-    # Get the unique document IDs from the doc_ids list.
-    unique_doc_ids = list(set(doc_ids))
-
-    # Create a dictionary to store the filenames for the documents in the unique_doc_ids list.
-    filename_map = {}
-
-    # Fetch the filenames for the documents in the unique_doc_ids list.
-    if unique_doc_ids:
-        result = (
-            supabase.table("project_documents")
-            .select("id, filename")
-            .in_("id", unique_doc_ids)
-            .execute()
-        )
-        filename_map = {doc["id"]: doc["filename"] for doc in result.data}
+    filename_map = get_document_filenames(chunks)
 
     # Process each chunk
     for chunk in chunks:
@@ -107,6 +159,45 @@ def build_context_from_retrieved_chunks(
     return texts, images, tables, citations
 
 
+def build_compact_context_from_retrieved_chunks(
+    chunks: List[Dict], max_chars_per_chunk: int
+) -> Tuple[str, List[Dict]]:
+    """
+    Format retrieved chunks as a compact, citation-tagged context for the agent model itself:
+    one "[n] filename (page p)" header plus the chunk's searchable content per chunk.
+    The content is the chunk text, or the AI summary for chunks with tables and images, so no
+    raw HTML or base64 images end up in the agent's context. Citation n is citations[n - 1].
+    """
+    if not chunks:
+        return "", []
+
+    filename_map = get_document_filenames(chunks)
+
+    context_parts = []
+    citations = []
+    for chunk in chunks:
+        content = (chunk.get("content") or "").strip()
+        if not content:
+            continue
+        if len(content) > max_chars_per_chunk:
+            content = content[:max_chars_per_chunk].rstrip() + " …"
+
+        doc_id = chunk.get("document_id")
+        filename = filename_map.get(doc_id, "Unknown Document")
+        page = chunk.get("page_number", "Unknown")
+        citations.append(
+            {
+                "chunk_id": chunk.get("id"),
+                "document_id": doc_id,
+                "filename": filename,
+                "page": page,
+            }
+        )
+        context_parts.append(f"[{len(citations)}] {filename} (page {page})\n{content}")
+
+    return "\n\n".join(context_parts), citations
+
+
 def validate_context_from_retrieved_chunks(
     texts: List[str], images: List[str], tables: List[str], citations: List[Dict]
 ) -> None:
@@ -157,9 +248,10 @@ def validate_context_from_retrieved_chunks(
 
 def prepare_prompt_and_invoke_llm(
     user_query: str, texts: List[str], images: List[str], tables: List[str]
-) -> str:
+) -> Tuple[str, Dict]:
     """
     Builds system prompt with context and invokes LLM with multi-modal support.
+    Returns (answer, usage) where usage holds the call's input_tokens and output_tokens.
     """
     # Build system prompt parts
     prompt_parts = []
@@ -255,41 +347,12 @@ def prepare_prompt_and_invoke_llm(
         f"🤖 Invoking LLM with {len(messages)} messages ({len(texts)} texts, {len(tables)} tables, {len(images)} images)..."
     )
     response = openAI["chat_llm"].invoke(messages)
+    usage = response.usage_metadata or {}
 
-    return response.content
-
-
-def rrf_rank_and_fuse(search_results_list, weights=None, k=60):
-    """RRF (Reciprocal Rank Fusion) ranking"""
-    if not search_results_list or not any(search_results_list):
-        return []
-
-    if weights is None:
-        weights = [1.0 / len(search_results_list)] * len(search_results_list)
-
-    chunk_scores = {}
-    all_chunks = {}
-
-    for search_idx, results in enumerate(search_results_list):
-        weight = weights[search_idx]
-
-        for rank, chunk in enumerate(results):
-            chunk_id = chunk.get("id")
-            if not chunk_id:
-                continue
-
-            rrf_score = weight * (1.0 / (k + rank + 1))
-
-            if chunk_id in chunk_scores:
-                chunk_scores[chunk_id] += rrf_score
-            else:
-                chunk_scores[chunk_id] = rrf_score
-                all_chunks[chunk_id] = chunk
-
-    sorted_chunk_ids = sorted(
-        chunk_scores.keys(), key=lambda cid: chunk_scores[cid], reverse=True
-    )
-    return [all_chunks[chunk_id] for chunk_id in sorted_chunk_ids]
+    return response.content, {
+        "input_tokens": usage.get("input_tokens", 0),
+        "output_tokens": usage.get("output_tokens", 0),
+    }
 
 
 def generate_query_variations(original_query: str, num_queries: int = 3) -> List[str]:
@@ -7,6 +7,8 @@ from src.config.index import appConfig
 from src.services.awsS3 import s3_client
 import uuid
 from src.services.celery import perform_rag_ingestion_task
+from src.rag.ingestion.index import delete_ingestion_checkpoints
+from src.rag.retrieval.cache import invalidate_project_cache
 import os
 
 
@@ -224,6 +226,7 @@ async def confirm_file_upload_to_s3(
                 .eq("id", document_id)
                 .execute()
             )
+            invalidate_project_cache(project_id)
             
             return {
                 "message": "Tabular file confirmed successfully and registered for Data Analysis Engine.",
@@ -241,6 +244,7 @@ async def confirm_file_upload_to_s3(
             .eq("s3_key", s3_key)
             .execute()
         )
+        invalidate_project_cache(project_id)
 
         # ! Celery - Starts Background Processing - RAG Ingestion Task
         document_id = document_update_result.data[0]["id"]
@@ -376,7 +380,7 @@ async def delete_project_document(
     """
     ! Logic Flow:
     * 1. Verify document exists and belongs to the current user and take complete project document record
-    * 2. Delete file from S3 (only for actual files, not for URLs)
+    * 2. Delete file from S3 (only for actual files, not for URLs) and the document's ingestion checkpoints
     * 3. Delete document from database
     * 4. Return successfully deleted document data
     """
@@ -401,6 +405,8 @@ async def delete_project_document(
         s3_key = document_ownership_verification_result.data[0]["s3_key"]
         if s3_key:
             s3_client.delete_object(Bucket=appConfig["s3_bucket_name"], Key=s3_key)
+        # Left behind by an ingestion that failed for good or was still running (URLs have them too)
+        delete_ingestion_checkpoints(file_id)
 
         # Delete document from database
         document_deletion_result = (
@@ -418,6 +424,8 @@ async def delete_project_document(
                 detail="Failed to delete document",
             )
 
+        invalidate_project_cache(project_id)
+
         return {
             "message": "Document deleted successfully",
             "data": document_deletion_result.data[0],
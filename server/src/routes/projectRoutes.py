@@ -1,12 +1,17 @@
+import asyncio
+import json
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import StreamingResponse
+from langchain_core.messages import AIMessage, ToolMessage
 from src.services.supabase import supabase
 from src.services.clerkAuth import get_current_user_clerk_id
 from src.models.index import ProjectCreate, ProjectSettings
 from src.models.index import MessageCreate, MessageRole
 from src.rag.retrieval.index import retrieve_context
 from src.rag.retrieval.utils import prepare_prompt_and_invoke_llm
+from src.rag.retrieval.cache import invalidate_project_cache
 from src.agents.simple_agent.agent import create_simple_custom_agent
-from src.agents.supervisor_agent.agent import create_supervisor_agent
+from src.agents.cache import get_chat_agent
 from typing import List, Dict
 
 router = APIRouter(tags=["projectRoutes"])
@@ -23,6 +28,7 @@ router = APIRouter(tags=["projectRoutes"])
   
   - PUT `/api/projects/{project_id}/settings` ~ Update specific project settings
   - POST `/api/projects/{project_id}/chats/{chat_id}/messages` ~ Send a message to a Specific Chat
+  - POST `/api/projects/{project_id}/chats/{chat_id}/messages/stream` ~ Send a message and stream the AI response (SSE)
   
 """
 
@@ -105,9 +111,10 @@ async def create_project(
             "similarity_threshold": 0.3,
             "number_of_queries": 5,
             "reranking_enabled": True,
-            "reranking_model": "reranker-english-v3.0",
+            "reranking_model": "lexical-bm25",
             "vector_weight": 0.7,
             "keyword_weight": 0.3,
+            "rag_tool_mode": "answer",
         }
 
         project_settings_creation_result = (
@@ -182,6 +189,7 @@ async def delete_project(
                 detail="Failed to delete project - please try again",
             )
 
+        invalidate_project_cache(project_id)
         successfully_deleted_project = project_deletion_result.data[0]
 
         return {
@@ -375,6 +383,8 @@ async def update_project_settings(
                 status_code=422, detail="Failed to update project settings"
             )
 
+        invalidate_project_cache(project_id)
+
         return {
             "message": "Project settings updated successfully",
             "data": project_settings_update_result.data[0],
@@ -435,6 +445,67 @@ def get_chat_history(chat_id:str, exclude_message_id:str =None)-> List[Dict[str,
         # If history retrieval fails, return empty list
         return []
 
+def create_user_message(chat_id: str, clerk_id: str, content: str) -> Dict:
+    message_insert_data = {
+        "content": content,
+        "chat_id": chat_id,
+        "clerk_id": clerk_id,
+        "role": MessageRole.USER.value,
+    }
+    message_creation_result = (
+        supabase.table("messages").insert(message_insert_data).execute()
+    )
+
+    if not message_creation_result.data:
+        raise HTTPException(status_code=422, detail="Failed to create message")
+
+    return message_creation_result.data[0]
+
+
+def create_assistant_message(
+    chat_id: str, clerk_id: str, content: str, citations: List[Dict]
+) -> Dict:
+    ai_response_insert_data = {
+        "content": content,
+        "chat_id": chat_id,
+        "clerk_id": clerk_id,
+        "role": MessageRole.ASSISTANT.value,
+        "citations": citations,
+    }
+    ai_response_creation_result = (
+        supabase.table("messages").insert(ai_response_insert_data).execute()
+    )
+    if not ai_response_creation_result.data:
+        raise HTTPException(status_code=422, detail="Failed to create AI response")
+
+    return ai_response_creation_result.data[0]
+
+
+def create_chat_agent(project_id: str):
+    """
+    Get the (cached) agent selected by the project's agent_type setting. Returns (agent, agent_type).
+    Falls back to an uncached simple agent if the project settings cannot be loaded.
+    """
+    try:
+        return get_chat_agent(project_id)
+    except Exception as e:
+        print(f"⚠️ Could not load the project's agent, using the simple agent: {str(e)}")
+        return create_simple_custom_agent(project_id=project_id), "simple"
+
+
+def build_agent_input(chat_history: List[Dict[str, str]], message_content: str) -> Dict:
+    """Agent input: the chat history as prior user/assistant messages, then the new user message."""
+    messages = [
+        {
+            "role": "user" if msg["role"].lower() == "user" else "assistant",
+            "content": msg["content"],
+        }
+        for msg in chat_history
+    ]
+    messages.append({"role": "user", "content": message_content})
+    return {"messages": messages}
+
+
 @router.post("/{project_id}/chats/{chat_id}/messages")
 async def send_message(
     project_id: str,
@@ -453,42 +524,12 @@ async def send_message(
     try:
         # Step 1 : Insert the message into the database.
         message_content = message.content
-        message_insert_data = {
-            "content": message_content,
-            "chat_id": chat_id,
-            "clerk_id": current_user_clerk_id,
-            "role": MessageRole.USER.value,
-        }
-        message_creation_result = (
-            supabase.table("messages").insert(message_insert_data).execute()
-        )
-
-        if not message_creation_result.data:
-            raise HTTPException(status_code=422, detail="Failed to create message")
-
-        current_message_id = message_creation_result.data[0]["id"]
-
-        # Step 2: Get project settings to retrieve agent_type
-        try: 
-            project_settings = await get_project_settings(project_id, current_user_clerk_id)
-            agent_type = project_settings["data"].get("agent_type","simple")
-        except Exception as e:
-            agent_type = "simple"
+        user_message = create_user_message(chat_id, current_user_clerk_id, message_content)
+        current_message_id = user_message["id"]
 
+        # Step 2: Get the agent configured in the project settings
         chat_history = get_chat_history(chat_id, exclude_message_id = current_message_id)
-
-        if agent_type == "simple":
-            agent = create_simple_custom_agent(
-                project_id=project_id,
-                # model="gpt-4o",
-                chat_history=chat_history
-            )
-        elif agent_type == "agentic":
-            agent = create_supervisor_agent(
-                project_id=project_id,
-                # model="gpt-4o",
-                chat_history=chat_history
-            )
+        agent, agent_type = create_chat_agent(project_id)
 
         print("agent_type: ", agent_type)
         print("message_content: ", message_content)
@@ -496,7 +537,7 @@ async def send_message(
         #     "messages": [HumanMessage(content=message_content)]
         # })
         try:
-            result = await agent.ainvoke({"messages": [{"role": "user", "content": message_content}]})
+            result = await agent.ainvoke(build_agent_input(chat_history, message_content))
         except Exception as e:
             print(f"ALARM: Agent failed with error: {str(e)}")
             import traceback
@@ -504,10 +545,10 @@ async def send_message(
         print("agent result: ", result)
         
         # # Step 3 : Retrieval
-        # texts, images, tables, citations = retrieve_context(project_id, message)
+        # texts, images, tables, citations, _ = retrieve_context(project_id, message)
 
         # # Step 4 : Generation (Retrived Context + User Message)
-        # final_response = prepare_prompt_and_invoke_llm(
+        # final_response, _ = prepare_prompt_and_invoke_llm(
         #     user_query=message, texts=texts, images=images, tables=tables
         # )
         final_response = result["messages"][-1].content
@@ -515,24 +556,15 @@ async def send_message(
     
 
         # Step 5: Insert the AI Response into the database.
-        ai_response_insert_data = {
-            "content": final_response,
-            "chat_id": chat_id,
-            "clerk_id": current_user_clerk_id,
-            "role": MessageRole.ASSISTANT.value,
-            "citations": citations,
-        }
-        ai_response_creation_result = (
-            supabase.table("messages").insert(ai_response_insert_data).execute()
+        ai_message = create_assistant_message(
+            chat_id, current_user_clerk_id, final_response, citations
         )
-        if not ai_response_creation_result.data:
-            raise HTTPException(status_code=422, detail="Failed to create AI response")
 
         return {
             "message": "Message created successfully",
             "data": {
-                "userMessage": message_creation_result.data[0],
-                "aiMessage": ai_response_creation_result.data[0],
+                "userMessage": user_message,
+                "aiMessage": ai_message,
             },
         }
 
@@ -546,6 +578,194 @@ async def send_message(
         )
 
 
+def format_sse(event: str, data) -> str:
+    """Encode one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def is_agent_model_token(message_chunk, metadata) -> bool:
+    """
+    True for tokens produced by the top-level agent's "model" node. Tokens of nested LLM calls
+    (rag_search's answer generation, supervisor sub-agents) run under other nodes or inside a
+    nested namespace ("parent:task|model:task") and are not streamed to the user.
+    """
+    return (
+        isinstance(message_chunk, AIMessage)  # streamed AIMessageChunks, or whole messages of non-streaming models
+        and metadata.get("langgraph_node") == "model"
+        and "|" not in metadata.get("langgraph_checkpoint_ns", "")
+    )
+
+
+def rag_metrics_of(tool_message) -> Dict:
+    """The latency and token metrics a rag_search ToolMessage carries in its artifact, else None."""
+    artifact = tool_message.artifact
+    return artifact.get("rag_metrics") if isinstance(artifact, dict) else None
+
+
+# Agent runs of streaming requests; referenced here so they finish even if the client disconnects.
+background_agent_runs = set()
+
+
+async def stream_agent_response(agent, agent_input: Dict, chat_id: str, clerk_id: str):
+    """
+    Run the agent and yield SSE events:
+    * token: {"content"} ~ a piece of the agent's answer
+    * tool_start: {"id", "name", "args"} ~ the model requested a tool call
+    * tool_end: {"id", "name", "metrics"} ~ a tool call finished (metrics: rag_search latency and tokens)
+    * citations: [...] ~ citations collected across all tool calls
+    * done: {"aiMessage"} ~ the persisted assistant message
+    * error: {"detail"}
+
+    The agent runs in a background task that pushes events onto a queue. If the client
+    disconnects, only this generator is closed: the run finishes and its answer is persisted,
+    so the chat history never ends with an unanswered user message.
+    """
+    events = asyncio.Queue()
+    run = asyncio.create_task(
+        run_agent_and_persist(agent, agent_input, chat_id, clerk_id, events)
+    )
+    background_agent_runs.add(run)
+    run.add_done_callback(background_agent_runs.discard)
+
+    while True:
+        event = await events.get()
+        if event is None:
+            break
+        yield event
+
+
+async def run_agent_and_persist(
+    agent, agent_input: Dict, chat_id: str, clerk_id: str, events: asyncio.Queue
+):
+    """
+    Stream the agent run into `events` (None marks the end) and persist the assistant message.
+    If the run fails after part of the answer was streamed, the partial answer is persisted.
+    """
+    final_response = ""
+    streamed_tokens = []
+    citations = []
+    tool_names = {}
+    completed = False
+
+    try:
+        async for mode, chunk in agent.astream(
+            agent_input,
+            stream_mode=["messages", "updates"],
+        ):
+            if mode == "messages":
+                message_chunk, metadata = chunk
+                if is_agent_model_token(message_chunk, metadata) and message_chunk.content:
+                    streamed_tokens.append(message_chunk.content)
+                    events.put_nowait(format_sse("token", {"content": message_chunk.content}))
+                continue
+
+            # mode == "updates": {node_name: state update}; tool nodes may return a list of updates
+            for node_updates in chunk.values():
+                for update in node_updates if isinstance(node_updates, list) else [node_updates]:
+                    if not isinstance(update, dict):
+                        continue
+                    citations.extend(update.get("citations") or [])
+
+                    for state_message in update.get("messages") or []:
+                        if isinstance(state_message, AIMessage):
+                            for tool_call in state_message.tool_calls:
+                                tool_names[tool_call["id"]] = tool_call["name"]
+                                events.put_nowait(
+                                    format_sse(
+                                        "tool_start",
+                                        {
+                                            "id": tool_call["id"],
+                                            "name": tool_call["name"],
+                                            "args": tool_call["args"],
+                                        },
+                                    )
+                                )
+                            if not state_message.tool_calls:
+                                final_response = state_message.content
+                            # This turn's tokens are complete; a failure later leaves only new ones partial
+                            streamed_tokens = []
+                        elif isinstance(state_message, ToolMessage):
+                            events.put_nowait(
+                                format_sse(
+                                    "tool_end",
+                                    {
+                                        "id": state_message.tool_call_id,
+                                        "name": tool_names.get(state_message.tool_call_id),
+                                        "metrics": rag_metrics_of(state_message),
+                                    },
+                                )
+                            )
+
+        completed = True
+        events.put_nowait(format_sse("citations", citations))
+
+    except Exception as e:
+        print(f"ALARM: Agent stream failed with error: {str(e)}")
+        events.put_nowait(format_sse("error", {"detail": str(e)}))
+
+    finally:
+        # Persist the complete answer, or whatever part of it was streamed before a failure.
+        response = final_response if completed else final_response or "".join(streamed_tokens)
+        try:
+            if completed or response:
+                ai_message = create_assistant_message(chat_id, clerk_id, response, citations)
+                if completed:
+                    events.put_nowait(format_sse("done", {"aiMessage": ai_message}))
+        except Exception as e:
+            print(f"ALARM: Failed to persist the streamed assistant message: {str(e)}")
+            events.put_nowait(format_sse("error", {"detail": str(e)}))
+        events.put_nowait(None)
+
+
+@router.post("/{project_id}/chats/{chat_id}/messages/stream")
+async def send_message_stream(
+    project_id: str,
+    chat_id: str,
+    message: MessageCreate,
+    current_user_clerk_id: str = Depends(get_current_user_clerk_id),
+):
+    """
+    ! Logic Flow:
+    * 1. Insert the user message into the database.
+    * 2. Get the agent configured in the project settings.
+    * 3. Stream the agent's tokens, tool calls and citations as Server-Sent Events.
+    * 4. Insert the AI Response into the database once the stream completes.
+    """
+    try:
+        user_message = create_user_message(
+            chat_id, current_user_clerk_id, message.content
+        )
+        chat_history = get_chat_history(chat_id, exclude_message_id=user_message["id"])
+        agent, agent_type = create_chat_agent(project_id)
+        print("agent_type: ", agent_type)
+
+        async def event_stream():
+            yield format_sse("user_message", {"userMessage": user_message})
+            async for event in stream_agent_response(
+                agent,
+                build_agent_input(chat_history, message.content),
+                chat_id,
+                current_user_clerk_id,
+            ):
+                yield event
+
+        return StreamingResponse(
+            event_stream(),
+            media_type="text/event-stream",
+            # Disable proxy buffering so tokens reach the client as they are produced.
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    except HTTPException as e:
+        raise e
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"An internal server error occurred while creating message: {str(e)}",
+        )
+
+
 @router.get('/{project_id}/documents/{document_id}/chunks/{chunk_id}')
 async def get_chunk(
     project_id: str,
@@ -1,19 +1,72 @@
+import httpx
+import openai
+import requests
+from botocore.exceptions import ClientError, HTTPClientError
+from botocore.exceptions import ConnectionError as BotoConnectionError
 from celery import Celery
 from src.config.index import appConfig
-from src.rag.ingestion.index import process_document
+from src.rag.ingestion.index import process_document, delete_ingestion_checkpoints
 
 celery_app = Celery(
     "multi-modal-rag",  # Name of the Celery App
     broker=appConfig["redis_url"],  # broker - Redis Queue - Tasks are queued
 )
 
+# Network, timeout and rate-limit errors of the services ingestion talks to. Anything else
+# (unsupported file type, missing document row, bad content) fails the same way on every retry.
+TRANSIENT_ERRORS = (
+    ConnectionError,
+    TimeoutError,
+    httpx.TransportError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    BotoConnectionError,
+    HTTPClientError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+TRANSIENT_S3_ERROR_CODES = {
+    "SlowDown",
+    "Throttling",
+    "RequestTimeout",
+    "InternalError",
+    "ServiceUnavailable",
+}
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    True if the error, or any error it was raised from, is transient.
+    Ingestion re-raises failures as `Exception(f"Failed to ...: {str(e)}")`, so the original
+    error is found by walking the exception chain.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, TRANSIENT_ERRORS):
+            return True
+        if (
+            isinstance(error, ClientError)
+            and error.response.get("Error", {}).get("Code") in TRANSIENT_S3_ERROR_CODES
+        ):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
 
-@celery_app.task
-def perform_rag_ingestion_task(document_id: str):
+@celery_app.task(bind=True, max_retries=3)
+def perform_rag_ingestion_task(self, document_id: str):
     try:
         process_document_result = process_document(document_id)
         return (
             f"Document {process_document_result['document_id']} processed successfully"
         )
     except Exception as e:
-        return f"Failed to process document {document_id}: {str(e)}"
\ No newline at end of file
+        # Ingestion is checkpointed, so a retry resumes where this attempt stopped.
+        # Only transient failures are retried; deterministic ones would fail again.
+        if is_transient_error(e) and self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=30 * 2**self.request.retries)
+        # No attempt will resume from this document's checkpoints any more.
+        delete_ingestion_checkpoints(document_id)
+        return f"Failed to process document {document_id}: {str(e)}"
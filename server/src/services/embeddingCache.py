@@ -0,0 +1,56 @@
+import hashlib
+from array import array
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from src.services.localCache import SqliteLRUCache
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed cache in front of an embeddings model.
+
+    Vectors are keyed by a hash of (model, dimensions, text), so identical text - repeated
+    headers, disclaimers, re-uploaded files, repeated queries - is embedded only once,
+    across documents, re-ingestion and retrieval alike. Only the cache misses are sent
+    to the provider, in a single request.
+    """
+
+    def __init__(self, embeddings, cache: SqliteLRUCache):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = embeddings.model
+        self.dimensions = embeddings.dimensions
+
+    def cache_key(self, text: str) -> str:
+        return hashlib.sha256(
+            f"{self.model}:{self.dimensions}:{text}".encode("utf-8")
+        ).hexdigest()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.cache_key(text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # pgvector stores single precision floats, so float32 blobs lose nothing.
+        vectors = {key: array("f", blob).tolist() for key, blob in cached.items()}
+
+        missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+        if missing:
+            new_vectors = self.embeddings.embed_documents(list(missing.values()))
+            vectors.update(zip(missing.keys(), new_vectors))
+            self.cache.set_many(
+                {
+                    key: array("f", vector).tobytes()
+                    for key, vector in zip(missing.keys(), new_vectors)
+                }
+            )
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        # OpenAI embeds queries and documents the same way, so both share one cache entry.
+        return self.embed_documents([text])[0]
+
+    def stats(self):
+        return self.cache.stats()
@@ -1,14 +1,20 @@
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from src.config.index import appConfig
+from src.services.embeddingCache import CachedEmbeddings
+from src.services.localCache import embedding_cache
 
 openAI = {
     "embeddings_llm": ChatOpenAI(
         model="gpt-4o-mini", api_key=appConfig["openai_api_key"], temperature=0
     ),
-    "embeddings": OpenAIEmbeddings(
-        model="text-embedding-3-large",
-        api_key=appConfig["openai_api_key"],
-        dimensions=1536,  # ! Do not changes this value. It is used in the document_chunks embedding vector.
+    # Every embed_documents / embed_query call (ingestion and retrieval) goes through the local cache.
+    "embeddings": CachedEmbeddings(
+        OpenAIEmbeddings(
+            model="text-embedding-3-large",
+            api_key=appConfig["openai_api_key"],
+            dimensions=1536,  # ! Do not changes this value. It is used in the document_chunks embedding vector.
+        ),
+        cache=embedding_cache,
     ),
     "chat_llm": ChatOpenAI(
         model="gpt-4o", api_key=appConfig["openai_api_key"], temperature=0
@@ -0,0 +1,116 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.config.index import appConfig
+
+LOCAL_CACHE_DIR = Path(appConfig["local_cache_dir"])
+LOCAL_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+LOCAL_CACHE_PATH = LOCAL_CACHE_DIR / "cache.sqlite3"
+
+
+class SqliteLRUCache:
+    """
+    Size-bounded key/value store backed by a table in a local SQLite file.
+
+    Survives restarts and is shared by every process that sees LOCAL_CACHE_DIR: the API and the
+    Celery worker on one machine, or their containers through the rag_cache volume in docker-compose.
+    Each read refreshes the entry's `last_used` timestamp and the least recently used
+    entries are evicted once the table grows past `max_entries`.
+    """
+
+    def __init__(self, table: str, max_entries: int, path: Path = LOCAL_CACHE_PATH):
+        self.table = table
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        # One connection shared by all threads of this process, guarded by self.lock.
+        self.connection = sqlite3.connect(
+            str(path), timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.connection.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_last_used_idx ON {table} (last_used)"
+        )
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys present in the cache."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+
+        found = {}
+        with self.lock:
+            # Stay well under SQLite's limit on bound parameters per statement.
+            for start in range(0, len(keys), 500):
+                key_batch = keys[start : start + 500]
+                placeholders = ",".join("?" * len(key_batch))
+                rows = self.connection.execute(
+                    f"SELECT key, value FROM {self.table} WHERE key IN ({placeholders})",
+                    key_batch,
+                ).fetchall()
+                found.update(rows)
+
+            if found:
+                now = time.time()
+                self.connection.executemany(
+                    f"UPDATE {self.table} SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items):
+        """Store {key: value} pairs, then evict the least recently used overflow."""
+        if not items:
+            return
+
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, last_used) VALUES (?, ?, ?)",
+                [(key, value, now) for key, value in items.items()],
+            )
+
+            (entries,) = self.connection.execute(
+                f"SELECT COUNT(*) FROM {self.table}"
+            ).fetchone()
+            if entries > self.max_entries:
+                self.connection.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY last_used ASC LIMIT ?)",
+                    (entries - self.max_entries,),
+                )
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+embedding_cache = SqliteLRUCache(
+    "embeddings", max_entries=appConfig["embedding_cache_max_entries"]
+)
+
+summary_cache = SqliteLRUCache(
+    "ai_summaries", max_entries=appConfig["summary_cache_max_entries"]
+)
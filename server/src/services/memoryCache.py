@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe in-process LRU cache whose entries expire `ttl_seconds` after they are written.
+
+    Lookups refresh an entry's recency but not its expiry. Once more than `max_entries` are
+    stored, the least recently used entries are evicted.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (expires_at, value)
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys present and not expired."""
+        found = {}
+        now = time.monotonic()
+        with self.lock:
+            for key in dict.fromkeys(keys):
+                entry = self.entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    continue
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self.entries[key]
+                    self.misses += 1
+                    continue
+                self.entries.move_to_end(key)
+                found[key] = value
+                self.hits += 1
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, items):
+        """Store {key: value} pairs, then evict the least recently used overflow."""
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self.lock:
+            for key, value in items.items():
+                self.entries[key] = (expires_at, value)
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "entries": len(self.entries),
+        }
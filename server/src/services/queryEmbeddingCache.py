@@ -0,0 +1,118 @@
+import hashlib
+from array import array
+from typing import List
+
+from src.config.index import appConfig
+from src.services.llm import openAI
+from src.services.memoryCache import TTLCache
+from src.services.redisClient import redis_client
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold and collapse whitespace so trivially different phrasings share an entry."""
+    return " ".join(query.casefold().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Two-tier TTL cache for retrieval query embeddings, keyed by (model, dimensions, normalized query).
+
+    The in-process LRU absorbs repeated rag_search calls within one API process; the optional
+    Redis tier shares vectors between processes. Only queries missing from both tiers are
+    embedded, in a single batched request.
+    """
+
+    def __init__(self, embeddings, memory: TTLCache, redis=None, key_prefix="query-embedding"):
+        self.embeddings = embeddings
+        self.memory = memory
+        self.redis = redis
+        self.key_prefix = key_prefix
+        self.redis_hits = 0
+        self.redis_errors = 0
+
+    def cache_key(self, query: str) -> str:
+        digest = hashlib.sha256(
+            f"{self.embeddings.model}:{self.embeddings.dimensions}:{normalize_query(query)}".encode(
+                "utf-8"
+            )
+        ).hexdigest()
+        return f"{self.key_prefix}:{digest}"
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        keys = [self.cache_key(query) for query in queries]
+        vectors = self.memory.get_many(keys)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if missing and self.redis is not None:
+            shared = self.get_from_redis(missing)
+            self.redis_hits += len(shared)
+            vectors.update(shared)
+            self.memory.set_many(shared)
+            missing = [key for key in missing if key not in shared]
+
+        if missing:
+            query_by_key = dict(zip(keys, queries))
+            new_vectors = dict(
+                zip(
+                    missing,
+                    self.embeddings.embed_documents([query_by_key[key] for key in missing]),
+                )
+            )
+            vectors.update(new_vectors)
+            self.memory.set_many(new_vectors)
+            if self.redis is not None:
+                self.set_in_redis(new_vectors)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embed_queries([query])[0]
+
+    def get_from_redis(self, keys):
+        try:
+            blobs = self.redis.mget(keys)
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"⚠️ Query embedding cache: Redis read failed: {str(e)}")
+            return {}
+        return {
+            key: array("f", blob).tolist()
+            for key, blob in zip(keys, blobs)
+            if blob is not None
+        }
+
+    def set_in_redis(self, vectors):
+        try:
+            pipeline = self.redis.pipeline(transaction=False)
+            for key, vector in vectors.items():
+                pipeline.set(
+                    key,
+                    array("f", vector).tobytes(),
+                    ex=int(self.memory.ttl_seconds),
+                )
+            pipeline.execute()
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"⚠️ Query embedding cache: Redis write failed: {str(e)}")
+
+    def stats(self):
+        memory_stats = self.memory.stats()
+        lookups = memory_stats["hits"] + memory_stats["misses"]
+        hits = memory_stats["hits"] + self.redis_hits
+        return {
+            "memory_hits": memory_stats["hits"],
+            "redis_hits": self.redis_hits,
+            "misses": memory_stats["misses"] - self.redis_hits,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            "redis_errors": self.redis_errors,
+        }
+
+
+query_embedding_cache = QueryEmbeddingCache(
+    openAI["embeddings"],
+    memory=TTLCache(
+        max_entries=appConfig["query_embedding_cache_max_entries"],
+        ttl_seconds=appConfig["query_embedding_cache_ttl_seconds"],
+    ),
+    redis=redis_client if appConfig["query_embedding_cache_redis_enabled"] else None,
+)
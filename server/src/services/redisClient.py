@@ -0,0 +1,8 @@
+import redis
+from src.config.index import appConfig
+
+# Shared cache tier for the API processes. Reuses the Redis instance that brokers Celery tasks.
+# Callers treat Redis as best-effort: a failed read is a cache miss and a failed write is ignored.
+redis_client = redis.Redis.from_url(
+    appConfig["redis_url"], socket_timeout=0.5, socket_connect_timeout=0.5
+)
@@ -0,0 +1,23 @@
+-- Idempotent chunk ingestion
+-- document_chunks rows are upserted on (document_id, chunk_index), so a retried or resumed
+-- ingestion overwrites the rows it already wrote instead of duplicating them.
+
+-- Remove duplicates left behind by earlier retried ingestions (keep the first row written,
+-- by created_at and then id; ctid is a physical location, not insertion order).
+DELETE FROM document_chunks
+WHERE id IN (
+    SELECT id
+    FROM (
+        SELECT
+            id,
+            ROW_NUMBER() OVER (
+                PARTITION BY document_id, chunk_index
+                ORDER BY created_at ASC NULLS LAST, id ASC
+            ) AS row_number
+        FROM document_chunks
+    ) ranked
+    WHERE ranked.row_number > 1
+);
+
+ALTER TABLE document_chunks
+    ADD CONSTRAINT document_chunks_document_id_chunk_index_key UNIQUE (document_id, chunk_index);
@@ -0,0 +1,67 @@
+-- Server-side hybrid search.
+-- Runs the vector and full-text legs and fuses them with weighted Reciprocal Rank Fusion
+-- inside Postgres, returning only the final top-k chunk ids and their fused scores.
+-- Ties are broken the same way as rrf_rank_and_fuse in Python: vector results first
+-- (in vector rank order), then keyword-only results (in keyword rank order).
+
+CREATE OR REPLACE FUNCTION hybrid_search_document_chunks(
+    query_text text,
+    query_embedding vector,
+    filter_document_ids uuid[],
+    vector_weight double precision DEFAULT 0.7,
+    keyword_weight double precision DEFAULT 0.3,
+    chunks_per_search integer DEFAULT 20,
+    final_context_size integer DEFAULT 5,
+    match_threshold double precision DEFAULT 0.3,
+    rrf_k integer DEFAULT 60
+)
+RETURNS TABLE(
+    id uuid,
+    score double precision
+)
+LANGUAGE sql
+AS $function$
+WITH vector_results AS (
+    SELECT
+        dc.id,
+        row_number() OVER (ORDER BY dc.embedding <=> query_embedding ASC) AS rank
+    FROM
+        document_chunks dc
+    WHERE
+        dc.document_id = ANY(filter_document_ids)
+        AND dc.embedding IS NOT NULL
+        AND (1 - (dc.embedding <=> query_embedding)) > match_threshold
+    ORDER BY
+        dc.embedding <=> query_embedding ASC
+    LIMIT
+        chunks_per_search
+),
+keyword_results AS (
+    SELECT
+        dc.id,
+        row_number() OVER (
+            ORDER BY ts_rank_cd(dc.fts, websearch_to_tsquery('english', query_text)) DESC
+        ) AS rank
+    FROM
+        document_chunks dc
+    WHERE
+        dc.fts @@ websearch_to_tsquery('english', query_text)
+        AND dc.document_id = ANY(filter_document_ids)
+    ORDER BY
+        ts_rank_cd(dc.fts, websearch_to_tsquery('english', query_text)) DESC
+    LIMIT
+        chunks_per_search
+)
+SELECT
+    COALESCE(v.id, k.id) AS id,
+    COALESCE(vector_weight / (rrf_k + v.rank), 0)
+        + COALESCE(keyword_weight / (rrf_k + k.rank), 0) AS score
+FROM
+    vector_results v
+    FULL OUTER JOIN keyword_results k ON v.id = k.id
+ORDER BY
+    score DESC,
+    COALESCE(v.rank, chunks_per_search + k.rank) ASC
+LIMIT
+    final_context_size;
+$function$;
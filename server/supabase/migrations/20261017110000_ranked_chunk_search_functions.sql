@@ -0,0 +1,64 @@
+-- Light-weight ranking variants of the chunk search functions.
+-- Retrieval ranks with ids, scores, document_id and page_number only; the heavy
+-- original_content payload is fetched afterwards for the final context chunks.
+
+CREATE OR REPLACE FUNCTION vector_search_document_chunk_ids(
+    query_embedding vector,
+    filter_document_ids uuid[],
+    match_threshold double precision DEFAULT 0.3,
+    chunks_per_search integer DEFAULT 20
+)
+RETURNS TABLE(
+    id uuid,
+    document_id uuid,
+    page_number integer,
+    score double precision
+)
+LANGUAGE sql
+AS $function$
+SELECT
+    dc.id,
+    dc.document_id,
+    dc.page_number,
+    1 - (dc.embedding <=> query_embedding) AS score
+FROM
+    document_chunks dc
+WHERE
+    dc.document_id = ANY(filter_document_ids)
+    AND dc.embedding IS NOT NULL
+    AND (1 - (dc.embedding <=> query_embedding)) > match_threshold
+ORDER BY
+    dc.embedding <=> query_embedding ASC
+LIMIT
+    chunks_per_search;
+$function$;
+
+
+CREATE OR REPLACE FUNCTION keyword_search_document_chunk_ids(
+    query_text text,
+    filter_document_ids uuid[],
+    chunks_per_search integer DEFAULT 20
+)
+RETURNS TABLE(
+    id uuid,
+    document_id uuid,
+    page_number integer,
+    score double precision
+)
+LANGUAGE sql
+AS $function$
+SELECT
+    dc.id,
+    dc.document_id,
+    dc.page_number,
+    ts_rank_cd(dc.fts, websearch_to_tsquery('english', query_text))::double precision AS score
+FROM
+    document_chunks dc
+WHERE
+    dc.fts @@ websearch_to_tsquery('english', query_text)
+    AND dc.document_id = ANY(filter_document_ids)
+ORDER BY
+    ts_rank_cd(dc.fts, websearch_to_tsquery('english', query_text)) DESC
+LIMIT
+    chunks_per_search;
+$function$;
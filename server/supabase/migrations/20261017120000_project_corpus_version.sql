@@ -0,0 +1,33 @@
+-- Corpus version per project.
+-- Bumped by a trigger whenever a project document is added, deleted or changes processing
+-- status (which covers re-ingestion), so cached retrieval results keyed on it go stale
+-- automatically without every write path having to remember to invalidate them.
+
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS corpus_version BIGINT NOT NULL DEFAULT 0;
+
+CREATE OR REPLACE FUNCTION bump_project_corpus_version()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $function$
+BEGIN
+    UPDATE projects
+    SET corpus_version = corpus_version + 1
+    WHERE id = COALESCE(NEW.project_id, OLD.project_id);
+    RETURN NULL;
+END;
+$function$;
+
+DROP TRIGGER IF EXISTS project_documents_bump_corpus_version ON project_documents;
+DROP TRIGGER IF EXISTS project_documents_status_bump_corpus_version ON project_documents;
+
+CREATE TRIGGER project_documents_bump_corpus_version
+AFTER INSERT OR DELETE ON project_documents
+FOR EACH ROW
+EXECUTE FUNCTION bump_project_corpus_version();
+
+-- Progress updates rewrite processing_status often; only actual status changes count.
+CREATE TRIGGER project_documents_status_bump_corpus_version
+AFTER UPDATE OF processing_status ON project_documents
+FOR EACH ROW
+WHEN (OLD.processing_status IS DISTINCT FROM NEW.processing_status)
+EXECUTE FUNCTION bump_project_corpus_version();
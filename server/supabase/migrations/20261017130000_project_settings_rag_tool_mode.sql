@@ -0,0 +1,10 @@
+-- What the agents' rag_search tool returns per project:
+--   'answer'  : a written answer from a separate LLM call over the retrieved context (previous behaviour)
+--   'context' : the compact, citation-tagged retrieved context, answered by the agent model directly
+
+ALTER TABLE project_settings
+    ADD COLUMN IF NOT EXISTS rag_tool_mode TEXT NOT NULL DEFAULT 'answer';
+
+ALTER TABLE project_settings DROP CONSTRAINT IF EXISTS project_settings_rag_tool_mode_check;
+ALTER TABLE project_settings
+    ADD CONSTRAINT project_settings_rag_tool_mode_check CHECK (rag_tool_mode IN ('answer', 'context'));
@@ -0,0 +1,7 @@
+-- 'reranker-english-v3.0' was the hosted reranker projects were created with. It is not available
+-- locally and was reranked with lexical BM25 anyway, so store the reranker actually used; the
+-- settings sidebar only lists 'lexical-bm25'.
+
+UPDATE project_settings
+SET reranking_model = 'lexical-bm25'
+WHERE reranking_model = 'reranker-english-v3.0';